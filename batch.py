@@ -0,0 +1,222 @@
+import os
+import sys
+import glob
+import json
+import time
+import argparse
+import subprocess
+import configparser
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import stats
+from dag import CommitDag
+from visualizer import GitParser
+from summarize import summary_settings
+from history_cache import open_history_cache
+from bloom import open_path_index
+from pathfilter import PathFilter
+
+try:
+    import resource  # нет в Windows: ограничение памяти тогда не устанавливается
+except ImportError:
+    resource = None
+
+
+REPOSITORY_SECTION_PREFIX = 'repository'  # секции [repository NAME] или [repository:NAME]
+EXTENSIONS = {'mermaid': '.mmd', 'dot': '.dot', 'jsonl': '.jsonl'}
+
+
+# Функция получения списка репозиториев пакета из config.ini
+def collect_repositories(config):
+    """Возвращает задания — словари настроек по одному на репозиторий.
+
+    Репозитории берутся из секций [repository NAME] (repository_path, необязательно
+    output_file и любые настройки из [settings]) и из шаблонов glob в ключе repositories
+    секции [batch] (по одному на строку или через пробел). Настройки [settings] и [batch]
+    служат значениями по умолчанию; выход без output_file пишется в output_dir/NAME.<формат>,
+    а общий cache_dir заменяется на cache_dir/NAME.
+    """
+    defaults = dict(config['settings']) if config.has_section('settings') else {}
+    batch = dict(config['batch']) if config.has_section('batch') else {}
+    defaults.update(batch)
+    for key in ('repositories', 'workers', 'memory_limit_mb', 'timeout', 'report_file', 'repository_path', 'output_file'):
+        defaults.pop(key, None)
+    output_dir = defaults.get('output_dir', 'graphs')
+
+    jobs = []
+    for section in config.sections():
+        if section.startswith(REPOSITORY_SECTION_PREFIX) and section != REPOSITORY_SECTION_PREFIX:
+            name = section[len(REPOSITORY_SECTION_PREFIX):].lstrip(' :') or section
+            jobs.append({**defaults, 'name': name, **config[section]})
+    for pattern in batch.get('repositories', '').split():
+        for repo_path in sorted(glob.glob(os.path.expanduser(pattern))):
+            if os.path.isdir(os.path.join(repo_path, '.git')):
+                jobs.append({**defaults, 'name': os.path.basename(os.path.normpath(repo_path)), 'repository_path': repo_path})
+
+    names = set()
+    for job in jobs:
+        if job['name'] in names:  # одинаковые имена каталогов из разных шаблонов
+            job['name'] = f"{job['name']}-{len(names)}"
+        names.add(job['name'])
+        if 'cache_dir' in defaults and job.get('cache_dir') == defaults['cache_dir']:
+            # Общий cache_dir делится по репозиториям: кэши и индексы разных репозиториев не смешиваются
+            job['cache_dir'] = os.path.join(defaults['cache_dir'], job['name'])
+        if 'output_file' not in job:
+            extension = EXTENSIONS[job.get('output_format', 'mermaid')]
+            job['output_file'] = os.path.join(output_dir, job['name'] + extension)
+    return jobs
+
+
+# Функция построения графа одного репозитория (выполняется в отдельном процессе)
+def graph_repository(job):
+    """Пишет граф в output_file и возвращает число коммитов.
+
+    Граф сначала пишется во временный файл рядом с output_file и переименовывается только
+    после успешного завершения, поэтому упавший или прерванный запуск не оставляет
+    обрезанного графа.
+    """
+    config = configparser.ConfigParser(interpolation=None)
+    config.read_dict({'repository': job})
+    settings = config['repository']
+    repo_path = settings['repository_path']
+    output_format = settings.get('output_format', fallback='mermaid')
+
+    git_parser = GitParser(repo_path)
+    git_parser.history_cache = open_history_cache(settings, repo_path, 'visualizer', git_parser.store.has_object)
+    git_parser.path_index = open_path_index(settings, repo_path)
+    if settings.get('paths', fallback='').split():
+        git_parser.path_filter = PathFilter(settings['paths'].split())
+    tips = git_parser.get_tip_hashes(settings.get('refs', fallback='').split())
+    commit_hashes = list(dict.fromkeys(tips.values()))
+    dag = CommitDag()
+
+    output_file = settings['output_file']
+    os.makedirs(os.path.dirname(os.path.abspath(output_file)), exist_ok=True)
+    partial_file = output_file + '.partial'
+    with open(partial_file, 'w', encoding='utf-8') as output:
+        git_parser.write_graph(commit_hashes, output, output_format=output_format, dag=dag, **summary_settings(settings))
+    os.replace(partial_file, output_file)
+    if git_parser.history_cache is not None:
+        git_parser.history_cache.save(tips)
+    if git_parser.path_index is not None:
+        git_parser.path_index.save()
+    return len(dag)
+
+
+# Функция ограничения адресного пространства текущего процесса (вызывается в начале дочернего процесса)
+def limit_memory(memory_limit_mb):
+    limit = memory_limit_mb * 1024 * 1024
+    resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+
+
+# Функция обработки одного репозитория в дочернем процессе с ограничением памяти и времени
+def run_job(job, memory_limit_mb=None, timeout=None):
+    command = [sys.executable, os.path.abspath(__file__), '--run-one', json.dumps(job)]
+    if memory_limit_mb and resource is not None:
+        # Ограничение устанавливает сам дочерний процесс: preexec_fn небезопасен при работающих потоках пула
+        command += ['--memory-limit', str(memory_limit_mb)]
+    result = {'name': job['name'], 'repository_path': job['repository_path'], 'output_file': job['output_file']}
+    start = time.perf_counter()
+    try:
+        process = subprocess.run(command, capture_output=True, text=True, timeout=timeout,
+                                 cwd=os.path.dirname(os.path.abspath(__file__)))
+    except subprocess.TimeoutExpired:  # subprocess.run завершает процесс по истечении времени
+        result.update(status='timeout', error=f"Превышено время {timeout} с")
+    else:
+        if process.returncode == 0:
+            result.update(status='ok', commits=json.loads(process.stdout)['commits'])
+        else:
+            lines = process.stderr.strip().splitlines()
+            error = lines[-1] if lines else f"Код завершения {process.returncode}"
+            out_of_memory = 'MemoryError' in process.stderr or 'Cannot allocate memory' in process.stderr  # mmap pack-файла
+            status = 'memory' if out_of_memory or process.returncode == -9 else 'failed'
+            result.update(status=status, error=error)
+    result['wall_time_s'] = round(time.perf_counter() - start, 6)
+    if result['status'] != 'ok' and os.path.exists(job['output_file'] + '.partial'):
+        os.remove(job['output_file'] + '.partial')
+    return result
+
+
+# Функция параллельной обработки репозиториев пулом из workers потоков
+def run_batch(jobs, workers=4, memory_limit_mb=None, timeout=None, progress=None):
+    """Каждый репозиторий обрабатывается отдельным процессом, поэтому повреждённый репозиторий,
+    нехватка памяти или зависание затрагивают только его. Возвращает отчёт с результатами
+    по репозиториям, пропускной способностью и списком ошибок.
+    """
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        futures = [executor.submit(run_job, job, memory_limit_mb, timeout) for job in jobs]
+        for future in as_completed(futures):  # о медленном репозитории не ждём, чтобы сообщить о следующих
+            if progress is not None:
+                progress(future.result())
+    results = [future.result() for future in futures]
+    wall_time = time.perf_counter() - start
+    succeeded = [result for result in results if result['status'] == 'ok']
+    commits = sum(result['commits'] for result in succeeded)
+    return {
+        'repositories': len(results),
+        'succeeded': len(succeeded),
+        'failed': len(results) - len(succeeded),
+        'commits': commits,
+        'wall_time_s': round(wall_time, 6),
+        'repositories_per_s': round(len(results) / wall_time, 3) if wall_time else None,
+        'commits_per_s': round(commits / wall_time, 1) if wall_time else None,
+        'workers': workers,
+        'memory_limit_mb': memory_limit_mb if resource is not None else None,
+        'timeout_s': timeout,
+        'failures': [result for result in results if result['status'] != 'ok'],
+        'results': results,
+    }
+
+
+# Функция вывода строки о завершении обработки репозитория
+def print_result(result):
+    if result['status'] == 'ok':
+        print(f"{result['name']:30} {result['commits']:8} коммитов {result['wall_time_s']:8.2f} с -> {result['output_file']}",
+              file=sys.stderr)
+    else:
+        print(f"{result['name']:30} {result['status']:>8} {result['wall_time_s']:8.2f} с: {result['error']}", file=sys.stderr)
+
+
+def main(config_path, workers=None, memory_limit_mb=None, timeout=None, report_file=None):
+    config = configparser.ConfigParser()
+    config.read(config_path)
+    batch = config['batch'] if config.has_section('batch') else {}
+
+    workers = workers or int(batch.get('workers', os.cpu_count() or 1))
+    memory_limit_mb = memory_limit_mb or (int(batch['memory_limit_mb']) if batch.get('memory_limit_mb') else None)
+    timeout = timeout or (float(batch['timeout']) if batch.get('timeout') else None)
+    report_file = report_file or batch.get('report_file', '-')
+
+    jobs = collect_repositories(config)
+    if not jobs:
+        print("В конфигурационном файле не найдено ни одного репозитория.")
+        return 1
+    if memory_limit_mb and resource is None:
+        print("Ограничение памяти недоступно на этой платформе и не будет установлено.", file=sys.stderr)
+
+    report = run_batch(jobs, workers, memory_limit_mb, timeout, progress=print_result)
+    stats.write_summary(report, report_file)
+    print(f"Обработано репозиториев: {report['succeeded']} из {report['repositories']} "
+          f"за {report['wall_time_s']:.2f} с", file=sys.stderr)
+    return 1 if report['failed'] else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Построение графов для нескольких репозиториев из config.ini")
+    parser.add_argument("config_path", help="Введите путь до конфигурационного файла", type=str, nargs='?')
+    parser.add_argument("--workers", help="Число одновременно обрабатываемых репозиториев", type=int)
+    parser.add_argument("--memory-limit", help="Ограничение памяти одного репозитория в МиБ", type=int)
+    parser.add_argument("--timeout", help="Ограничение времени одного репозитория в секундах", type=float)
+    parser.add_argument("--report", help="Файл JSON-отчёта ('-' — stderr)")
+    parser.add_argument("--run-one", help=argparse.SUPPRESS)  # задание дочернего процесса в JSON
+    args = parser.parse_args()
+
+    if args.run_one:
+        if args.memory_limit and resource is not None:
+            limit_memory(args.memory_limit)
+        print(json.dumps({'commits': graph_repository(json.loads(args.run_one))}))
+    elif args.config_path:
+        sys.exit(main(args.config_path, args.workers, args.memory_limit, args.timeout, args.report))
+    else:
+        parser.error("не указан путь до конфигурационного файла")
@@ -0,0 +1,323 @@
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import platform
+import itertools
+import contextlib
+import subprocess
+
+try:
+    import resource  # нет в Windows: пиковая память тогда не измеряется
+except ImportError:
+    resource = None
+
+
+RESULTS_VERSION = 1
+TARGETS = ('get_commit_history', 'generate_mermaid', 'build_mermaid_graph', 'collect_dependencies')
+BASE_TIMESTAMP = 1700000000  # фиксированные даты: одинаковые параметры дают одинаковые SHA
+
+
+# Функция запуска git без вывода в консоль
+def git(repo_path, *args, stdin=None):
+    subprocess.run(['git', *args], cwd=repo_path, stdin=stdin, stdout=subprocess.DEVNULL, check=True)
+
+
+# Функция перечисления путей файлов дерева шириной width и глубиной depth
+def tree_paths(width, depth):
+    paths = []
+    for directories in itertools.product(range(width), repeat=depth):
+        prefix = ''.join(f'd{index}/' for index in directories)
+        paths.extend(f'{prefix}f{index}.txt' for index in range(width))
+    return paths
+
+
+# Функция генерации потока команд git fast-import для синтетической истории
+def fast_import_stream(commits, merge_ratio, width, depth, seed=0):
+    rng = random.Random(seed)
+    paths = tree_paths(width, depth)
+    marks = itertools.count(1)
+    master = side = None  # метки вершин веток master и side
+
+    def data(text):
+        payload = text.encode()
+        return b'data %d\n%s\n' % (len(payload), payload)
+
+    def commit(ref, number, parent, merge=None, changed=()):
+        mark = next(marks)
+        chunk = [b'commit refs/heads/%s\nmark :%d\n' % (ref.encode(), mark),
+                 b'committer Bench <bench@example.com> %d +0000\n' % (BASE_TIMESTAMP + number * 60),
+                 data(f'commit {number} on {ref}')]
+        if parent is not None:
+            chunk.append(b'from :%d\n' % parent)
+        if merge is not None:
+            chunk.append(b'merge :%d\n' % merge)
+        for path in changed:
+            chunk.append(b'M 100644 inline %s\n' % path.encode())
+            chunk.append(data(f'{path} @ {number}\n'))
+        return mark, b''.join(chunk)
+
+    master, chunk = commit('master', 0, None, changed=paths)
+    yield chunk
+    for number in range(1, commits):
+        changed = rng.sample(paths, min(len(paths), rng.randint(1, 3)))
+        roll = rng.random()
+        if side is not None and roll < merge_ratio:
+            master, chunk = commit('master', number, master, merge=side)
+            side = None
+        elif roll < 2 * merge_ratio:
+            side, chunk = commit('side', number, side if side is not None else master, changed=changed)
+        else:
+            master, chunk = commit('master', number, master, changed=changed)
+        yield chunk
+
+
+# Функция создания синтетического репозитория (packed — объекты в pack-файле, иначе loose-объекты)
+def generate_repo(repo_path, commits, merge_ratio=0.1, width=8, depth=2, packed=True, seed=0):
+    os.makedirs(repo_path)
+    git(repo_path, 'init', '-q', '-b', 'master')
+    process = subprocess.Popen(['git', 'fast-import', '--quiet'], cwd=repo_path, stdin=subprocess.PIPE)
+    for chunk in fast_import_stream(commits, merge_ratio, width, depth, seed):
+        process.stdin.write(chunk)
+    process.stdin.close()
+    if process.wait() != 0:
+        raise RuntimeError(f"git fast-import завершился с ошибкой в {repo_path}")
+
+    pack_dir = os.path.join(repo_path, '.git', 'objects', 'pack')
+    if packed:
+        git(repo_path, 'repack', '-adq')
+        git(repo_path, 'pack-refs', '--all')
+        return repo_path
+
+    # Распаковываем pack-файл fast-import в loose-объекты
+    for name in os.listdir(pack_dir):
+        if not name.endswith('.pack'):
+            continue
+        pack_path = os.path.join(pack_dir, name)
+        moved_path = os.path.join(repo_path, '.git', name)
+        os.replace(pack_path, moved_path)
+        os.remove(pack_path[:-5] + '.idx')
+        with open(moved_path, 'rb') as f:
+            git(repo_path, 'unpack-objects', '-q', stdin=f)
+        os.remove(moved_path)
+    return repo_path
+
+
+# Функция получения имени каталога репозитория по параметрам сценария
+def scenario_name(scenario):
+    storage = 'packed' if scenario['packed'] else 'loose'
+    return (f"c{scenario['commits']}-m{scenario['merge_ratio']}-w{scenario['width']}"
+            f"-d{scenario['depth']}-{storage}-s{scenario['seed']}")
+
+
+# Функция получения пикового потребления памяти процессом (или его дочерними процессами) в КиБ
+def peak_rss_kb(who='self'):
+    if resource is None:
+        return None
+    usage = resource.getrusage(resource.RUSAGE_SELF if who == 'self' else resource.RUSAGE_CHILDREN)
+    # В macOS ru_maxrss в байтах, в Linux — в килобайтах
+    return usage.ru_maxrss // 1024 if sys.platform == 'darwin' else usage.ru_maxrss
+
+
+# Функция замера одной цели в текущем процессе: вызывается в отдельном процессе на каждый замер
+def measure(target, repo_path):
+    import temp
+    import visualizer
+
+    store = None
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        if target == 'get_commit_history':
+            parser = visualizer.GitParser(repo_path)
+            store = parser.store
+            start = time.perf_counter()
+            parser.get_commit_history()
+        elif target == 'generate_mermaid':
+            parser = visualizer.GitParser(repo_path)
+            history = parser.get_commit_history()
+            store = parser.store
+            store.inflated = 0  # считаем только работу генератора
+            start = time.perf_counter()
+            parser.generate_mermaid(history)
+        elif target == 'build_mermaid_graph':
+            start = time.perf_counter()
+            temp.build_mermaid_graph(repo_path)
+        elif target == 'collect_dependencies':
+            graph = temp.GitDependencyGraph(repo_path)
+            start = time.perf_counter()
+            graph.collect_dependencies()
+            store = graph.store
+        else:
+            raise ValueError(f"Неизвестная цель замера: {target}")
+        wall_time = time.perf_counter() - start
+
+    return {
+        'wall_time_s': round(wall_time, 6),
+        'peak_rss_kb': peak_rss_kb(),
+        'children_peak_rss_kb': peak_rss_kb('children'),
+        'objects_inflated': store.inflated if store is not None else None,  # git log читает объекты сам
+    }
+
+
+# Функция замера цели в новом процессе, чтобы пиковая память не накапливалась между замерами
+def run_case(target, repo_path):
+    command = [sys.executable, os.path.abspath(__file__), 'measure', target, os.path.abspath(repo_path)]
+    result = subprocess.run(command, capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__)))
+    if result.returncode != 0:
+        raise RuntimeError(f"Замер {target} на {repo_path} завершился с ошибкой:\n{result.stderr}")
+    return json.loads(result.stdout)
+
+
+# Функция прогона всех сценариев: репозитории создаются один раз и переиспользуются между запусками
+def run_benchmarks(scenarios, targets=TARGETS, work_dir='bench-repos', repeat=1):
+    results = []
+    for scenario in scenarios:
+        repo_path = os.path.join(work_dir, scenario_name(scenario))
+        if not os.path.isdir(repo_path):
+            start = time.perf_counter()
+            generate_repo(repo_path, **scenario)
+            print(f"Создан {repo_path} за {time.perf_counter() - start:.2f} с", file=sys.stderr)
+        for target in targets:
+            runs = [run_case(target, repo_path) for _ in range(repeat)]
+            best = min(runs, key=lambda run: run['wall_time_s'])
+            results.append({'scenario': scenario_name(scenario), 'params': scenario, 'target': target,
+                            'repeat': repeat, **best})
+            print(f"{scenario_name(scenario):40} {target:22} {best['wall_time_s']:10.4f} с "
+                  f"{best['peak_rss_kb'] or '-':>8} КиБ {best['objects_inflated'] if best['objects_inflated'] is not None else '-':>8} объектов",
+                  file=sys.stderr)
+    return results
+
+
+# Функция записи результатов в JSON-файл вместе с описанием окружения
+def save_results(results, path):
+    git_version = subprocess.run(['git', '--version'], capture_output=True, text=True).stdout.strip()
+    document = {
+        'version': RESULTS_VERSION,
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'git': git_version,
+        'results': results,
+    }
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(document, f, ensure_ascii=False, indent=2)
+
+
+# Функция сравнения двух файлов результатов: возвращает строки (сценарий, цель, было, стало, отношение)
+def compare_results(old, new):
+    old_times = {(result['scenario'], result['target']): result['wall_time_s'] for result in old['results']}
+    rows = []
+    for result in new['results']:
+        key = (result['scenario'], result['target'])
+        if key in old_times:
+            before = old_times[key]
+            ratio = result['wall_time_s'] / before if before else float('inf')
+            rows.append((*key, before, result['wall_time_s'], ratio))
+    return rows
+
+
+# Функция построения содержимого объекта-дерева с заданным числом записей (каждая десятая — поддерево)
+def synthetic_tree(entries):
+    parts = []
+    for index in range(entries):
+        mode = b'40000' if index % 10 == 0 else b'100644'
+        parts.append(b'%s entry_%07d.txt\0%s' % (mode, index, index.to_bytes(20, 'big')))
+    return b''.join(parts)
+
+
+# Функция микрозамера разбора деревьев: время на одну запись для parse_tree и для записей GitParser
+def run_tree_benchmarks(sizes, repeat=5):
+    from trees import parse_tree
+
+    def entry_map(data):  # то же, что строит GitParser.read_tree_entries
+        return {name: (is_tree, sha) for name, sha, is_tree in parse_tree(data)}
+
+    results = []
+    for entries in sizes:
+        data = synthetic_tree(entries)
+        for target, function in (('parse_tree', parse_tree), ('read_tree_entries', entry_map)):
+            best = min(timed(function, data) for _ in range(repeat))
+            results.append({'scenario': f'tree-e{entries}', 'params': {'entries': entries}, 'target': target,
+                            'repeat': repeat, 'wall_time_s': round(best, 6),
+                            'ns_per_entry': round(best / entries * 1e9, 1)})
+            print(f"tree-e{entries:<34} {target:22} {best:10.4f} с {best / entries * 1e9:8.1f} нс/запись", file=sys.stderr)
+    return results
+
+
+# Функция замера одного вызова
+def timed(function, *args):
+    start = time.perf_counter()
+    function(*args)
+    return time.perf_counter() - start
+
+
+# Функция разбора сценариев из аргументов командной строки (декартово произведение параметров)
+def build_scenarios(args):
+    scenarios = []
+    for commits, merge_ratio, width, depth, storage in itertools.product(
+            args.commits, args.merge_ratio, args.width, args.depth, args.storage):
+        scenarios.append({'commits': commits, 'merge_ratio': merge_ratio, 'width': width, 'depth': depth,
+                          'packed': storage == 'packed', 'seed': args.seed})
+    return scenarios
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Замеры парсеров и генераторов графа на синтетических репозиториях")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    run = commands.add_parser('run', help="создать репозитории и выполнить замеры")
+    run.add_argument('--commits', type=int, nargs='+', default=[100, 1000])
+    run.add_argument('--merge-ratio', type=float, nargs='+', default=[0.1])
+    run.add_argument('--width', type=int, nargs='+', default=[8])
+    run.add_argument('--depth', type=int, nargs='+', default=[2])
+    run.add_argument('--storage', choices=['loose', 'packed'], nargs='+', default=['loose', 'packed'])
+    run.add_argument('--seed', type=int, default=0)
+    run.add_argument('--targets', choices=TARGETS, nargs='+', default=list(TARGETS))
+    run.add_argument('--repeat', type=int, default=3, help="число повторов, берётся лучшее время")
+    run.add_argument('--work-dir', default='bench-repos', help="каталог для синтетических репозиториев")
+    run.add_argument('--output', default='bench-results.json')
+
+    tree = commands.add_parser('tree', help="микрозамер разбора больших объектов-деревьев")
+    tree.add_argument('--entries', type=int, nargs='+', default=[10000, 100000])
+    tree.add_argument('--repeat', type=int, default=5)
+    tree.add_argument('--output', default='bench-results.json')
+
+    compare = commands.add_parser('compare', help="сравнить два файла результатов")
+    compare.add_argument('old')
+    compare.add_argument('new')
+    compare.add_argument('--threshold', type=float, default=1.2,
+                         help="отношение времени, начиная с которого замер считается регрессией")
+
+    measure_case = commands.add_parser('measure')  # служебная команда: один замер в отдельном процессе
+    measure_case.add_argument('target', choices=TARGETS)
+    measure_case.add_argument('repo_path')
+
+    args = parser.parse_args(argv)
+    if args.command == 'measure':
+        print(json.dumps(measure(args.target, args.repo_path)))
+    elif args.command == 'run':
+        results = run_benchmarks(build_scenarios(args), args.targets, args.work_dir, args.repeat)
+        save_results(results, args.output)
+        print(f"Результаты сохранены в {args.output}")
+    elif args.command == 'tree':
+        save_results(run_tree_benchmarks(args.entries, args.repeat), args.output)
+        print(f"Результаты сохранены в {args.output}")
+    else:
+        with open(args.old, encoding='utf-8') as f:
+            old = json.load(f)
+        with open(args.new, encoding='utf-8') as f:
+            new = json.load(f)
+        regressions = 0
+        for scenario, target, before, after, ratio in compare_results(old, new):
+            mark = ''
+            if ratio >= args.threshold:
+                mark = '  РЕГРЕССИЯ'
+                regressions += 1
+            print(f"{scenario:40} {target:22} {before:10.4f} -> {after:10.4f} ({ratio:5.2f}x){mark}")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
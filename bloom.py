@@ -0,0 +1,178 @@
+import os
+import sys
+import struct
+import hashlib
+import tempfile
+
+import stats
+
+
+BITS_PER_ENTRY = 10      # как в git: около 1% ложных срабатываний при 7 хеш-функциях
+NUM_HASHES = 7
+MAX_CHANGED_PATHS = 512  # при большем числе путей фильтр не строится и отвечает "может быть"
+TRUNCATED_FILTER = b'\xff'
+INDEX_MAGIC = b'CPBI'
+INDEX_VERSION = 1
+HEADER = struct.Struct('>4sBBBxI')  # магия, версия, число хеш-функций, бит на ключ, число коммитов
+RECORD = struct.Struct('>20sH')     # SHA коммита, длина фильтра в байтах
+
+
+# Функция получения ключей фильтра: каждый изменённый путь и все каталоги над ним
+def path_keys(paths):
+    keys = set()
+    for path in paths:
+        path = path.encode('utf-8') if isinstance(path, str) else path
+        while path and path not in keys:
+            keys.add(path)
+            path = path[:max(path.rfind(b'/'), 0)]
+    return keys
+
+
+# Функция получения пары хешей ключа для двойного хеширования (h1 + i * h2). Нечётный h2
+# даёт разные позиции и в маленьких фильтрах, размер которых кратен 8 битам
+def key_hashes(key):
+    first, second = struct.unpack('>II', hashlib.blake2b(key, digest_size=8).digest())
+    return first, second | 1
+
+
+# Функция построения фильтра Блума по списку изменённых путей коммита
+def make_filter(paths):
+    keys = path_keys(paths)
+    if len(keys) > MAX_CHANGED_PATHS:
+        return TRUNCATED_FILTER
+    if not keys:
+        return b''  # коммит ничего не изменил: ни один путь не подходит
+    size = (len(keys) * BITS_PER_ENTRY + 7) // 8
+    bits = bytearray(size)
+    count = size * 8
+    for key in keys:
+        first, second = key_hashes(key)
+        for index in range(NUM_HASHES):
+            position = (first + index * second) % count
+            bits[position >> 3] |= 1 << (position & 7)
+    return bytes(bits)
+
+
+# Функция проверки ключа по фильтру: False — путь точно не изменялся, True — мог измениться
+def filter_contains(bloom, hashes):
+    if not bloom:
+        return False
+    count = len(bloom) * 8
+    first, second = hashes
+    for index in range(NUM_HASHES):
+        position = (first + index * second) % count
+        if not bloom[position >> 3] & (1 << (position & 7)):
+            return False
+    return True
+
+
+class ChangedPathIndex:
+    """Индекс изменённых путей на диске: по фильтру Блума на коммит, как в commit-graph git.
+
+    Фильтр строится по полному списку изменённых файлов коммита (относительно всех родителей)
+    и по каталогам над ними. По нему обход с фильтром путей пропускает коммиты, которые
+    точно не затрагивали нужные пути, не читая их деревьев. Файл — заголовок, записи
+    (SHA, длина, фильтр) и SHA-1 всего предыдущего содержимого; повреждённый файл
+    отбрасывается, и индекс строится заново.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.filters = {}   # SHA коммита -> фильтр (байты)
+        self.dirty = False
+
+    @staticmethod
+    def default_path(repo_path, cache_dir=None):
+        """Путь к индексу: по умолчанию внутри .git анализируемого репозитория."""
+        return os.path.join(cache_dir or os.path.join(repo_path, '.git'), 'graph-changed-paths.bidx')
+
+    def __len__(self):
+        return len(self.filters)
+
+    def __contains__(self, commit_hash):
+        return commit_hash in self.filters
+
+    def load(self):
+        """Читает индекс с диска. Возвращает False, если индекса нет или он был отброшен."""
+        self.filters = {}
+        self.dirty = False
+        if not os.path.isfile(self.path):
+            return False
+        try:
+            self.filters = self._read()
+        except (OSError, ValueError, struct.error) as e:
+            print(f"Индекс изменённых путей {self.path} повреждён и будет перестроен: {e}", file=sys.stderr)
+            return False
+        return True
+
+    def _read(self):
+        with open(self.path, 'rb') as f:
+            data = f.read()
+        if len(data) < HEADER.size + 20 or hashlib.sha1(data[:-20]).digest() != data[-20:]:
+            raise ValueError("несовпадение контрольной суммы")
+        magic, version, num_hashes, bits_per_entry, count = HEADER.unpack_from(data)
+        if (magic, version, num_hashes, bits_per_entry) != (INDEX_MAGIC, INDEX_VERSION, NUM_HASHES, BITS_PER_ENTRY):
+            raise ValueError("несовпадение версии или параметров индекса")
+        filters = {}
+        offset = HEADER.size
+        for _ in range(count):
+            commit_sha, size = RECORD.unpack_from(data, offset)
+            offset += RECORD.size
+            filters[commit_sha.hex()] = data[offset:offset + size]
+            offset += size
+        if offset != len(data) - 20:
+            raise ValueError("число записей не совпадает с заголовком")
+        return filters
+
+    def add(self, commit_hash, changed_files):
+        if commit_hash not in self.filters:
+            self.filters[commit_hash] = make_filter(changed_files)
+            self.dirty = True
+
+    def might_touch(self, commit_hash, paths_hashes):
+        """True/False — мог ли коммит изменить один из путей, None — коммита нет в индексе.
+
+        paths_hashes — по списку key_hashes на путь: сам путь и каталоги над ним. Путь мог
+        измениться, только если в фильтре есть все его ключи (как в git).
+        """
+        bloom = self.filters.get(commit_hash)
+        if bloom is None:
+            if stats.active is not None:
+                stats.active.count('bloom.miss')
+            return None
+        result = any(all(filter_contains(bloom, key) for key in keys) for keys in paths_hashes)
+        if stats.active is not None:
+            stats.active.count('bloom.maybe' if result else 'bloom.definitely_not')
+        return result
+
+    def save(self):
+        """Атомарно записывает индекс, если в нём появились новые коммиты."""
+        if not self.dirty:
+            return
+        parts = [HEADER.pack(INDEX_MAGIC, INDEX_VERSION, NUM_HASHES, BITS_PER_ENTRY, len(self.filters))]
+        for commit_hash, bloom in self.filters.items():
+            parts.append(RECORD.pack(bytes.fromhex(commit_hash), len(bloom)))
+            parts.append(bloom)
+        data = b''.join(parts)
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        # Уникальное временное имя: одновременные запуски не пишут в один и тот же файл
+        fd, temp_path = tempfile.mkstemp(prefix=os.path.basename(self.path) + '.', suffix='.tmp', dir=directory)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+                f.write(hashlib.sha1(data).digest())
+            os.replace(temp_path, self.path)
+        except BaseException:
+            os.remove(temp_path)
+            raise
+        self.dirty = False
+
+
+# Функция открытия индекса изменённых путей по настройкам из config.ini (None, если он отключён)
+def open_path_index(settings, repo_path):
+    if not settings.getboolean('changed_path_index', fallback=True):
+        return None
+    index = ChangedPathIndex(ChangedPathIndex.default_path(repo_path, settings.get('cache_dir', fallback=None)))
+    index.load()
+    return index
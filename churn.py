@@ -0,0 +1,170 @@
+from collections import Counter
+from itertools import combinations
+
+try:
+    import numpy as np  # необязательная зависимость: без неё статистика считается циклами Python
+except ImportError:
+    np = None
+
+
+MAX_CO_CHANGE_FILES = 100  # коммиты с большим числом файлов (массовые правки) не дают пар совместных изменений
+
+
+# Функция построения таблицы каталогов: для каждого пути — все каталоги над ним
+def directory_table(paths):
+    """Возвращает (каталоги, смещения, идентификаторы каталогов) в формате CSR по путям dag.paths."""
+    directories = []
+    directory_index = {}
+    offsets = [0]
+    directory_ids = []
+    for path in paths:
+        slash = path.rfind('/')
+        while slash > 0:
+            directory = path[:slash]
+            directory_id = directory_index.get(directory)
+            if directory_id is None:
+                directory_id = directory_index[directory] = len(directories)
+                directories.append(directory)
+            directory_ids.append(directory_id)
+            slash = path.rfind('/', 0, slash)
+        offsets.append(len(directory_ids))
+    return directories, offsets, directory_ids
+
+
+# Функция получения различных значений массива и числа их повторов через сортировку
+# (для целочисленных ключей быстрее np.unique)
+def _unique_counts(keys):
+    keys = np.sort(keys)
+    starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]]) if len(keys) else np.zeros(0, dtype=np.int64)
+    return keys[starts], np.diff(np.r_[starts, len(keys)])
+
+
+# Функция получения разреженной матрицы инцидентности коммит × путь из компактного графа
+def incidence(dag, include_merges=False):
+    """Возвращает (строки коммитов, идентификаторы путей) без повторов, упорядоченные по строке и пути.
+
+    Данные берутся прямо из CSR-массивов CommitDag без копирования списков файлов. Слияния
+    по умолчанию пропускаются: их списки файлов повторяют изменения влитых веток.
+    """
+    path_count = max(len(dag.paths), 1)
+    if np is None:
+        pairs = set()
+        for row in range(len(dag)):
+            if include_merges or dag.parent_offsets[row + 1] - dag.parent_offsets[row] <= 1:
+                pairs.update((row, path_id) for path_id in dag.path_ids[dag.path_offsets[row]:dag.path_offsets[row + 1]])
+        pairs = sorted(pairs)
+        return [row for row, _ in pairs], [path_id for _, path_id in pairs]
+
+    sizes = np.diff(np.frombuffer(dag.path_offsets, dtype=np.dtype(dag.path_offsets.typecode)).astype(np.int64))
+    rows = np.repeat(np.arange(len(dag), dtype=np.int64), sizes)
+    path_ids = np.frombuffer(dag.path_ids, dtype=np.dtype(dag.path_ids.typecode)).astype(np.int64)
+    if not include_merges:
+        parent_counts = np.diff(np.frombuffer(dag.parent_offsets, dtype=np.dtype(dag.parent_offsets.typecode)))
+        keep = parent_counts[rows] <= 1
+        rows, path_ids = rows[keep], path_ids[keep]
+    keys = _unique_counts(rows * path_count + path_ids)[0]  # повторы — файл изменён относительно нескольких родителей
+    return keys // path_count, keys % path_count
+
+
+# Функция отбора top самых частых элементов: по убыванию числа, при равенстве — по идентификатору
+def _top(counts, top):
+    if np is None:
+        return sorted((index for index, count in enumerate(counts) if count), key=lambda index: (-counts[index], index))[:top]
+    order = np.lexsort((np.arange(len(counts)), -counts))
+    return [int(index) for index in order[:top] if counts[index]]
+
+
+# Функция подсчёта изменений и последнего изменившего коммита для путей (или каталогов)
+def _count_changes(rows, ids, size):
+    if np is None:
+        counts = [0] * size
+        last = [-1] * size
+        for row, item in zip(rows, ids):
+            counts[item] += 1
+            last[item] = max(last[item], row)
+        return counts, last
+    counts = np.bincount(ids, minlength=size)
+    last = np.full(size, -1, dtype=np.int64)
+    np.maximum.at(last, ids, rows)
+    return counts, last
+
+
+# Функция перехода от пар (коммит, путь) к парам (коммит, каталог) без повторов
+def _directory_incidence(rows, path_ids, offsets, directory_ids, directory_count):
+    if np is None:
+        pairs = sorted({(row, directory_id) for row, path_id in zip(rows, path_ids)
+                        for directory_id in directory_ids[offsets[path_id]:offsets[path_id + 1]]})
+        return [row for row, _ in pairs], [directory_id for _, directory_id in pairs]
+    offsets = np.asarray(offsets, dtype=np.int64)
+    directory_ids = np.asarray(directory_ids, dtype=np.int64)
+    lengths = offsets[path_ids + 1] - offsets[path_ids]
+    entries = np.repeat(np.arange(len(path_ids)), lengths)
+    # Позиция каждого каталога в CSR: начало списка пути плюс номер внутри списка
+    within = np.arange(len(entries)) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+    directories = directory_ids[offsets[path_ids][entries] + within]
+    count = max(directory_count, 1)
+    keys = _unique_counts(rows[entries] * count + directories)[0]
+    return keys // count, keys % count
+
+
+# Функция подсчёта пар путей, изменённых в одном коммите
+def _co_changes(rows, path_ids, path_count, top, max_files):
+    if np is None:
+        files_by_row = {}
+        for row, path_id in zip(rows, path_ids):
+            files_by_row.setdefault(row, []).append(path_id)
+        pairs = Counter()
+        for files in files_by_row.values():
+            if len(files) <= max_files:
+                pairs.update(combinations(files, 2))
+        return [(first, second, count) for (first, second), count in
+                sorted(pairs.items(), key=lambda item: (-item[1], item[0][0] * path_count + item[0][1]))[:top]]
+
+    if not len(rows):
+        return []
+    # Пары строятся по группам коммитов с одинаковым числом файлов: матрица m × k и пары столбцов
+    starts = np.flatnonzero(np.r_[True, rows[1:] != rows[:-1]])
+    sizes = np.diff(np.r_[starts, len(rows)])
+    keys = []
+    for size in _unique_counts(sizes)[0]:
+        if size < 2 or size > max_files:
+            continue
+        group = starts[sizes == size]
+        files = path_ids[group[:, None] + np.arange(size)]  # пути внутри коммита упорядочены по возрастанию
+        first, second = np.triu_indices(size, 1)
+        keys.append((files[:, first] * path_count + files[:, second]).ravel())
+    if not keys:
+        return []
+    pair_keys, counts = _unique_counts(np.concatenate(keys))
+    order = np.lexsort((pair_keys, -counts))[:top]
+    return [(int(pair_keys[index] // path_count), int(pair_keys[index] % path_count), int(counts[index])) for index in order]
+
+
+def churn_report(dag, top=20, include_merges=False, max_co_change_files=MAX_CO_CHANGE_FILES):
+    """Считает по графу коммитов частоту изменений файлов и каталогов и совместные изменения.
+
+    Возвращает словарь для JSON-отчёта: top файлов и каталогов по числу изменивших их коммитов
+    (с последним из них) и top пар файлов, чаще всего изменявшихся в одном коммите. Последним
+    считается коммит с наибольшей строкой графа: GitParser добавляет коммиты после их родителей.
+    С NumPy все подсчёты идут по столбцам разреженной матрицы коммит × путь, без NumPy — циклами.
+    """
+    path_count = len(dag.paths)
+    rows, path_ids = incidence(dag, include_merges)
+    directories, offsets, directory_ids = directory_table(dag.paths)
+    directory_rows, directory_items = _directory_incidence(rows, path_ids, offsets, directory_ids, len(directories))
+
+    def summary(names, rows, ids):
+        counts, last = _count_changes(rows, ids, len(names))
+        return [{'path': names[index], 'changes': int(counts[index]), 'last_commit': dag.sha(dag.row_ids[int(last[index])])}
+                for index in _top(counts, top)]
+
+    commits = len(set(rows)) if np is None else len(_unique_counts(rows)[0])
+    return {
+        'engine': 'python' if np is None else 'numpy',
+        'commits': commits,
+        'paths': path_count,
+        'files': summary(dag.paths, rows, path_ids),
+        'directories': summary(directories, directory_rows, directory_items),
+        'co_changes': [{'paths': [dag.paths[first], dag.paths[second]], 'commits': count}
+                       for first, second, count in _co_changes(rows, path_ids, path_count, top, max_co_change_files)],
+    }
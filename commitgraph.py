@@ -0,0 +1,158 @@
+import os
+import sys
+import struct
+
+from gitstore import map_file
+
+
+GRAPH_SIGNATURE = b'CGPH'
+PARENT_NONE = 0x70000000
+PARENT_EXTRA_EDGES = 0x80000000
+LAST_EDGE = 0x80000000
+
+
+class CommitGraphLayer:
+    """Один файл commit-graph: таблицы фиксированной ширины, отображённые в память."""
+
+    def __init__(self, path, base_count):
+        self.path = path
+        self.base_count = base_count  # число коммитов в предыдущих слоях цепочки
+        self.data = map_file(path)
+        signature, version, hash_version, chunk_count = struct.unpack_from('>4sBBB', self.data, 0)
+        if signature != GRAPH_SIGNATURE or version != 1 or hash_version != 1:
+            raise ValueError(f"Неподдерживаемый формат commit-graph: {path}")
+
+        chunks = {}
+        for position in range(chunk_count):
+            chunk_id, offset = struct.unpack_from('>4sQ', self.data, 8 + position * 12)
+            chunks[chunk_id] = offset
+        for chunk_id in (b'OIDF', b'OIDL', b'CDAT'):
+            if chunk_id not in chunks:
+                raise ValueError(f"В commit-graph нет блока {chunk_id.decode()}: {path}")
+
+        self.fanout = struct.unpack_from('>256I', self.data, chunks[b'OIDF'])
+        self.count = self.fanout[255]
+        self.oid_start = chunks[b'OIDL']
+        self.data_start = chunks[b'CDAT']
+        self.edges_start = chunks.get(b'EDGE')
+
+    def find(self, sha):
+        """Возвращает локальную позицию коммита (sha — 20 байт) или None."""
+        first = sha[0]
+        low = self.fanout[first - 1] if first else 0
+        high = self.fanout[first]
+        while low < high:
+            middle = (low + high) // 2
+            start = self.oid_start + middle * 20
+            current = self.data[start:start + 20]
+            if current < sha:
+                low = middle + 1
+            elif current > sha:
+                high = middle
+            else:
+                return middle
+        return None
+
+    def sha(self, position):
+        start = self.oid_start + position * 20
+        return self.data[start:start + 20]
+
+    def record(self, position):
+        """Возвращает (дерево, родители в глобальной нумерации, поколение, время коммита)."""
+        start = self.data_start + position * 36
+        tree = self.data[start:start + 20]
+        first_parent, second_parent, high, low = struct.unpack_from('>IIII', self.data, start + 20)
+        parents = []
+        if first_parent != PARENT_NONE:
+            parents.append(first_parent)
+        if second_parent & PARENT_EXTRA_EDGES:
+            # Octopus-слияние: остальные родители перечислены в блоке EDGE
+            edge = self.edges_start + (second_parent & ~PARENT_EXTRA_EDGES) * 4
+            while True:
+                value = struct.unpack_from('>I', self.data, edge)[0]
+                parents.append(value & ~LAST_EDGE)
+                if value & LAST_EDGE:
+                    break
+                edge += 4
+        elif second_parent != PARENT_NONE:
+            parents.append(second_parent)
+        generation = high >> 2
+        commit_time = ((high & 0x3) << 32) | low
+        return tree, parents, generation, commit_time
+
+    def close(self):
+        self.data.close()
+
+
+class CommitGraph:
+    """Чтение commit-graph Git (одиночный файл или цепочка слоёв).
+
+    Коммиты нумеруются глобально: сначала все коммиты базового слоя, затем следующих.
+    Родители, дерево и номер поколения извлекаются индексированием таблиц без
+    распаковки объектов коммитов.
+    """
+
+    def __init__(self, layers):
+        self.layers = layers
+
+    @classmethod
+    def open(cls, repo_path):
+        """Открывает commit-graph репозитория или возвращает None, если его нет или он некорректен."""
+        info_dir = os.path.join(repo_path, '.git', 'objects', 'info')
+        chain_path = os.path.join(info_dir, 'commit-graphs', 'commit-graph-chain')
+        if os.path.isfile(chain_path):
+            with open(chain_path, 'r', encoding='utf-8') as f:
+                paths = [os.path.join(info_dir, 'commit-graphs', f'graph-{line.strip()}.graph') for line in f if line.strip()]
+        elif os.path.isfile(os.path.join(info_dir, 'commit-graph')):
+            paths = [os.path.join(info_dir, 'commit-graph')]
+        else:
+            return None
+
+        layers = []
+        try:
+            for path in paths:
+                base_count = layers[-1].base_count + layers[-1].count if layers else 0
+                layers.append(CommitGraphLayer(path, base_count))
+        except (OSError, ValueError, struct.error) as e:
+            print(f"commit-graph не используется: {e}", file=sys.stderr)
+            for layer in layers:
+                layer.close()
+            return None
+        return cls(layers)
+
+    def _layer(self, position):
+        for layer in reversed(self.layers):
+            if position >= layer.base_count:
+                return layer
+        raise IndexError(position)
+
+    def lookup(self, hex_sha):
+        """Возвращает глобальную позицию коммита или None, если его нет в графе."""
+        sha = bytes.fromhex(hex_sha)
+        for layer in self.layers:
+            position = layer.find(sha)
+            if position is not None:
+                return layer.base_count + position
+        return None
+
+    def sha(self, position):
+        layer = self._layer(position)
+        return layer.sha(position - layer.base_count).hex()
+
+    def get(self, hex_sha):
+        """Возвращает (дерево, SHA родителей, поколение, время коммита) или None."""
+        position = self.lookup(hex_sha)
+        if position is None:
+            return None
+        layer = self._layer(position)
+        tree, parents, generation, commit_time = layer.record(position - layer.base_count)
+        return tree.hex(), [self.sha(parent) for parent in parents], generation, commit_time
+
+    def generation(self, hex_sha):
+        record = self.get(hex_sha)
+        return record[2] if record else None
+
+    def close(self):
+        for layer in self.layers:
+            layer.close()
+        self.layers = []
@@ -0,0 +1,242 @@
+import os
+import sys
+import json
+import time
+import argparse
+import threading
+import socketserver
+import configparser
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs
+
+from visualizer import GitParser
+from dag import CommitDag
+from emitters import EMITTERS
+from summarize import collapse_chains
+from history_cache import open_history_cache
+
+
+class GraphDaemon:
+    """Граф коммитов репозитория, загруженный один раз и обновляемый по изменению ссылок.
+
+    Ссылки (.git/HEAD, .git/refs, packed-refs) опрашиваются с интервалом poll_interval.
+    Когда ссылка сдвигается вперёд, в граф добавляются только новые коммиты (обход
+    новые вершины..старые вершины); если ссылка удалена или переписана так, что её
+    прежний коммит больше не достижим, граф строится заново. Ответы на запросы
+    кэшируются до следующего изменения ссылок.
+    """
+
+    def __init__(self, repo_path, refs=(), history_cache=None, poll_interval=1.0):
+        self.repo_path = repo_path
+        self.ref_names = list(refs)          # пусто — все ссылки и HEAD
+        self.parser = GitParser(repo_path, history_cache=history_cache)
+        self.poll_interval = poll_interval
+        self.lock = threading.RLock()        # запросы читают граф, опрос ссылок его дополняет
+        self.dag = CommitDag()
+        self.tips = {}
+        self.fingerprint = None
+        self.responses = {}                  # параметры запроса -> готовый ответ
+        self.loaded_at = self.updated_at = None
+        self.reloads = 0
+
+    # Функция получения отпечатка файлов ссылок: (путь, время изменения, размер)
+    def ref_fingerprint(self):
+        git_dir = os.path.join(self.repo_path, '.git')
+        paths = [os.path.join(git_dir, 'HEAD'), os.path.join(git_dir, 'packed-refs')]
+        for directory, _, files in os.walk(os.path.join(git_dir, 'refs')):
+            paths.extend(os.path.join(directory, name) for name in files if not name.endswith('.lock'))
+        fingerprint = []
+        for path in sorted(paths):
+            try:
+                info = os.stat(path)
+            except OSError:
+                continue
+            fingerprint.append((path, info.st_mtime_ns, info.st_size))
+        return tuple(fingerprint)
+
+    def load(self):
+        """Строит граф по всем вершинам с нуля."""
+        with self.lock:
+            self.fingerprint = self.ref_fingerprint()
+            tips = self.parser.get_tip_hashes(self.ref_names)
+            self.dag = CommitDag()
+            self.tips = {}
+            self.ingest(tips)
+            self.loaded_at = self.updated_at = time.time()
+
+    def ingest(self, tips):
+        """Добавляет в граф коммиты, достижимые из tips и не достижимые из прежних вершин."""
+        new_tips = [commit_hash for commit_hash in dict.fromkeys(tips.values()) if commit_hash not in self.dag]
+        selected = None
+        if self.tips and new_tips:
+            old_tips = [commit_hash for commit_hash in dict.fromkeys(self.tips.values()) if commit_hash in self.dag]
+            selected = self.parser.select_commits(new_tips, old_tips)
+        added = 0
+        if new_tips:
+            for commit_info in self.parser.iter_commits(new_tips if selected is None else list(selected), selected=selected):
+                # Родители вне нового участка уже есть в графе; отсутствующие объекты пропускаем
+                walked = set(commit_info['parents'])
+                parents = [parent for parent in commit_info['parent_hashes'] if parent in walked or parent in self.dag]
+                self.dag.add_commit(commit_info['sha'], commit_info['name'], parents,
+                                    commit_info['changed_files'], commit_info['tree'])
+                added += 1
+        self.tips = dict(tips)
+        self.responses = {}
+        if self.parser.history_cache is not None:
+            self.parser.history_cache.save(self.tips)
+        return added
+
+    # Функция проверки, что прежний коммит ссылки достижим из новых вершин
+    def is_reachable(self, commit_hash, tips):
+        try:
+            return not self.parser.select_commits([commit_hash], list(dict.fromkeys(tips.values())))
+        except KeyError:  # коммит удалён сборщиком мусора
+            return False
+
+    def refresh(self):
+        """Проверяет ссылки и дополняет граф. Возвращает число новых коммитов или None без изменений."""
+        fingerprint = self.ref_fingerprint()
+        if fingerprint == self.fingerprint:
+            return None
+        with self.lock:
+            self.fingerprint = fingerprint
+            self.parser.store.refresh()  # после git fetch/gc могли появиться новые pack-файлы
+            tips = self.parser.get_tip_hashes(self.ref_names)
+            moved = [commit_hash for name, commit_hash in self.tips.items() if tips.get(name) != commit_hash]
+            if any(not self.is_reachable(commit_hash, tips) for commit_hash in dict.fromkeys(moved)):
+                # История переписана: часть графа больше не достижима
+                self.reloads += 1
+                self.dag = CommitDag()
+                self.tips = {}
+            added = self.ingest(tips)
+            self.updated_at = time.time()
+            return added
+
+    def watch(self, stop):
+        """Опрашивает ссылки, пока не установлено событие stop."""
+        while not stop.wait(self.poll_interval):
+            try:
+                added = self.refresh()
+            except Exception as e:  # ошибка чтения посреди git gc и т. п.: повторим на следующем шаге
+                print(f"Ошибка при обновлении графа: {e}", file=sys.stderr)
+                self.fingerprint = None
+                continue
+            if added:
+                print(f"Добавлено коммитов: {added}", file=sys.stderr)
+
+    def query(self, output_format='mermaid', collapse=False, max_depth=None, first_parent=False):
+        """Возвращает граф в выбранном формате; повторный запрос без изменений ссылок берётся из кэша."""
+        if output_format not in EMITTERS:
+            raise ValueError(f"Неизвестный формат: {output_format}")
+        key = (output_format, collapse, max_depth, first_parent)
+        with self.lock:
+            response = self.responses.get(key)
+            if response is None:
+                if collapse or max_depth is not None or first_parent:
+                    records = collapse_chains(self.dag, list(self.tips.values()), max_depth, first_parent, 2 if collapse else None)
+                else:
+                    records = self.dag.iter_records()
+                response = self.responses[key] = ''.join(EMITTERS[output_format](records)).encode('utf-8')
+            return response
+
+    def status(self):
+        with self.lock:
+            return {'repository': self.repo_path, 'commits': len(self.dag), 'tips': self.tips,
+                    'loaded_at': self.loaded_at, 'updated_at': self.updated_at, 'reloads': self.reloads}
+
+
+CONTENT_TYPES = {'mermaid': 'text/plain; charset=utf-8', 'dot': 'text/vnd.graphviz; charset=utf-8',
+                 'jsonl': 'application/x-ndjson; charset=utf-8'}
+
+
+# Функция создания обработчика HTTP-запросов для демона
+def make_handler(daemon):
+    class GraphRequestHandler(BaseHTTPRequestHandler):
+        """GET /graph?format=mermaid|dot|jsonl&collapse=1&max_depth=N&first_parent=1 и GET /status."""
+
+        def do_GET(self):
+            url = urlsplit(self.path)
+            params = {name: values[-1] for name, values in parse_qs(url.query).items()}
+            try:
+                if url.path == '/graph':
+                    output_format = params.get('format', 'mermaid')
+                    body = daemon.query(output_format, params.get('collapse') in ('1', 'yes', 'true'),
+                                        int(params['max_depth']) if params.get('max_depth') else None,
+                                        params.get('first_parent') in ('1', 'yes', 'true'))
+                    self.reply(200, CONTENT_TYPES[output_format], body)
+                elif url.path == '/status':
+                    self.reply(200, 'application/json', json.dumps(daemon.status(), ensure_ascii=False).encode('utf-8'))
+                else:
+                    self.reply(404, 'text/plain; charset=utf-8', 'Неизвестный запрос\n'.encode('utf-8'))
+            except ValueError as e:
+                self.reply(400, 'text/plain; charset=utf-8', f'{e}\n'.encode('utf-8'))
+
+        def reply(self, code, content_type, body):
+            self.send_response(code)
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):  # для Unix-сокета адреса клиента нет
+            pass
+
+    return GraphRequestHandler
+
+
+class ThreadingUnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """HTTP поверх Unix-сокета: `curl --unix-socket PATH http://localhost/graph`."""
+
+    daemon_threads = True
+
+
+# Функция запуска сервера: localhost HTTP на порту http_port или Unix-сокет socket_path
+def make_server(daemon, http_port=None, socket_path=None):
+    handler = make_handler(daemon)
+    if socket_path:
+        if os.path.exists(socket_path):
+            os.remove(socket_path)  # сокет от прошлого запуска
+        return ThreadingUnixHTTPServer(socket_path, handler)
+    return ThreadingHTTPServer(('127.0.0.1', http_port or 0), handler)
+
+
+def main(config_path, http_port=None, socket_path=None, poll_interval=None):
+    config = configparser.ConfigParser()
+    config.read(config_path)
+    settings = config['settings']
+    repo_path = settings.get('repository_path')
+    poll_interval = poll_interval or settings.getfloat('poll_interval', fallback=1.0)
+
+    graph_daemon = GraphDaemon(repo_path, settings.get('refs', fallback='').split(), poll_interval=poll_interval)
+    graph_daemon.parser.history_cache = open_history_cache(settings, repo_path, 'visualizer', graph_daemon.parser.store.has_object)
+    start = time.perf_counter()
+    graph_daemon.load()
+    print(f"Граф загружен: {len(graph_daemon.dag)} коммитов за {time.perf_counter() - start:.2f} с", file=sys.stderr)
+
+    server = make_server(graph_daemon, http_port, socket_path)
+    stop = threading.Event()
+    watcher = threading.Thread(target=graph_daemon.watch, args=(stop,), daemon=True)
+    watcher.start()
+    address = socket_path or f"http://127.0.0.1:{server.server_address[1]}"
+    print(f"Запросы принимаются: {address} (/graph, /status)", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stop.set()
+        server.server_close()
+        if socket_path and os.path.exists(socket_path):
+            os.remove(socket_path)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Демон графа коммитов: граф в памяти, обновление по изменению ссылок")
+    parser.add_argument("config_path", help="Введите путь до конфигурационного файла", type=str)
+    transport = parser.add_mutually_exclusive_group()
+    transport.add_argument("--http", help="Порт HTTP на 127.0.0.1 (0 — любой свободный)", type=int, default=8765)
+    transport.add_argument("--socket", help="Путь к Unix-сокету вместо HTTP-порта")
+    parser.add_argument("--poll", help="Интервал опроса ссылок в секундах", type=float)
+    args = parser.parse_args()
+
+    main(args.config_path, args.http, args.socket, args.poll)
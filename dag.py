@@ -0,0 +1,103 @@
+from array import array
+
+
+class CommitRecord:
+    """Запись коммита в компактном графе: сообщение и дерево, без снимка файлов."""
+
+    __slots__ = ('name', 'tree')
+
+    def __init__(self, name, tree):
+        self.name = name    # сообщение коммита
+        self.tree = tree    # SHA корневого дерева (20 байт) или None
+
+
+class CommitDag:
+    """Компактный граф коммитов для очень больших историй.
+
+    SHA хранятся как 20-байтовые ключи и получают плотные целые идентификаторы.
+    Родители и изменённые файлы хранятся в формате CSR: массив смещений array('I')
+    и массив индексов, общий для всех коммитов; пути файлов — идентификаторы в
+    таблице интернированных путей. Строки (row) нумеруются в порядке добавления коммитов.
+    """
+
+    def __init__(self):
+        self.ids = {}                      # SHA (20 байт) -> идентификатор
+        self.shas = bytearray()            # идентификатор -> SHA, по 20 байт подряд
+        self.rows = array('i')             # идентификатор -> строка или -1, если коммит не добавлен
+        self.row_ids = array('I')          # строка -> идентификатор
+        self.records = []                  # строка -> CommitRecord
+        self.parent_offsets = array('I', [0])
+        self.parent_ids = array('I')
+        self.path_offsets = array('I', [0])
+        self.path_ids = array('I')
+        self.paths = []                    # идентификатор пути -> путь
+        self.path_index = {}               # путь -> идентификатор пути
+
+    def intern_sha(self, hex_sha):
+        """Возвращает идентификатор SHA, заводя новый при первом появлении."""
+        sha = bytes.fromhex(hex_sha)
+        commit_id = self.ids.get(sha)
+        if commit_id is None:
+            commit_id = self.ids[sha] = len(self.rows)
+            self.shas += sha
+            self.rows.append(-1)
+        return commit_id
+
+    def intern_path(self, path):
+        path_id = self.path_index.get(path)
+        if path_id is None:
+            path_id = self.path_index[path] = len(self.paths)
+            self.paths.append(path)
+        return path_id
+
+    def sha(self, commit_id):
+        return self.shas[commit_id * 20:commit_id * 20 + 20].hex()
+
+    def row(self, hex_sha):
+        """Возвращает строку коммита или None, если коммит ещё не добавлен."""
+        commit_id = self.ids.get(bytes.fromhex(hex_sha))
+        if commit_id is None or self.rows[commit_id] < 0:
+            return None
+        return self.rows[commit_id]
+
+    def __len__(self):
+        return len(self.records)
+
+    def __contains__(self, hex_sha):
+        return self.row(hex_sha) is not None
+
+    def add_commit(self, hex_sha, name, parent_hashes, changed_files=(), tree_hash=None):
+        """Добавляет коммит и возвращает его строку (повторное добавление игнорируется)."""
+        commit_id = self.intern_sha(hex_sha)
+        if self.rows[commit_id] >= 0:
+            return self.rows[commit_id]
+        row = len(self.records)
+        self.rows[commit_id] = row
+        self.row_ids.append(commit_id)
+        self.records.append(CommitRecord(name, bytes.fromhex(tree_hash) if tree_hash else None))
+        self.parent_ids.extend(self.intern_sha(parent) for parent in parent_hashes)
+        self.parent_offsets.append(len(self.parent_ids))
+        self.path_ids.extend(self.intern_path(path) for path in changed_files)
+        self.path_offsets.append(len(self.path_ids))
+        return row
+
+    def parents(self, row):
+        """Возвращает идентификаторы родителей коммита."""
+        return self.parent_ids[self.parent_offsets[row]:self.parent_offsets[row + 1]]
+
+    def changed_files(self, row):
+        return [self.paths[path_id] for path_id in self.path_ids[self.path_offsets[row]:self.path_offsets[row + 1]]]
+
+    def record(self, row):
+        """Возвращает запись (SHA, сообщение, изменённые файлы, SHA родителей) для генераторов графа."""
+        return (self.sha(self.row_ids[row]), self.records[row].name, self.changed_files(row),
+                [self.sha(parent) for parent in self.parents(row)])
+
+    def iter_records(self):
+        for row in range(len(self.records)):
+            yield self.record(row)
+
+    def add_records(self, records):
+        """Добавляет записи (SHA, сообщение, файлы, родители) по мере поступления и отдаёт их из графа."""
+        for commit_hash, name, changed_files, parent_hashes in records:
+            yield self.record(self.add_commit(commit_hash, name, parent_hashes, changed_files))
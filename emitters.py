@@ -0,0 +1,71 @@
+import json
+
+
+SHORT_SHA_LENGTH = 12  # длина сокращённого SHA в идентификаторах узлов
+
+
+# Функция получения идентификатора узла по SHA коммита
+def node_id(commit_hash):
+    return commit_hash[:SHORT_SHA_LENGTH]
+
+
+# Функция экранирования текста подписи узла mermaid
+def escape_label(text):
+    return text.replace('&', '#amp;').replace('"', '#quot;').replace('<', '#lt;').replace('>', '#gt;')
+
+
+# Функция перевода на язык mermaid: по одной строке на узел и на связь
+def mermaid_lines(commits):
+    """Генерирует строки графа mermaid из записей (SHA, сообщение, изменённые файлы, SHA родителей).
+
+    Если список файлов равен None, подпись узла состоит только из сообщения.
+    """
+    yield "graph TD;\n"
+    for commit_hash, message, changed_files, parent_hashes in commits:
+        commit_id = node_id(commit_hash)
+        label = escape_label(message)
+        if changed_files is not None:
+            label += '<br>Changed files: ' + (escape_label(', '.join(changed_files)) or 'No changes')
+        yield f'    {commit_id}("{label}")\n'
+        for parent_hash in parent_hashes:
+            yield f"    {node_id(parent_hash)} --> {commit_id}\n"
+
+
+# Функция экранирования строки для языка DOT
+def escape_dot(text):
+    return text.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+# Функция перевода в формат Graphviz DOT: по одной строке на узел и на связь
+def dot_lines(commits):
+    """Генерирует строки графа DOT из тех же записей, что и mermaid_lines (для `dot -Tsvg` и т. п.)."""
+    yield "digraph commits {\n"
+    yield "    node [shape=box];\n"
+    for commit_hash, message, changed_files, parent_hashes in commits:
+        commit_id = node_id(commit_hash)
+        label = escape_dot(message)
+        if changed_files is not None:
+            label += '\\nChanged files: ' + (escape_dot(', '.join(changed_files)) or 'No changes')
+        yield f'    "{commit_id}" [label="{label}"];\n'
+        for parent_hash in parent_hashes:
+            yield f'    "{node_id(parent_hash)}" -> "{commit_id}";\n'
+    yield "}\n"
+
+
+# Функция перевода в формат JSON Lines: по одному объекту на коммит
+def jsonl_lines(commits):
+    """Генерирует строки JSON: {"id", "sha", "message", "changed_files", "parents"} на каждую запись."""
+    for commit_hash, message, changed_files, parent_hashes in commits:
+        record = {'id': node_id(commit_hash), 'sha': commit_hash, 'message': message,
+                  'changed_files': changed_files, 'parents': list(parent_hashes)}
+        yield json.dumps(record, ensure_ascii=False) + '\n'
+
+
+EMITTERS = {'mermaid': mermaid_lines, 'dot': dot_lines, 'jsonl': jsonl_lines}  # форматы вывода по имени
+
+
+# Функция потоковой записи строк графа в один или несколько файлов
+def write_lines(lines, *outputs):
+    for line in lines:
+        for output in outputs:
+            output.write(line)
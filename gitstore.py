@@ -0,0 +1,365 @@
+import os
+import mmap
+import zlib
+import struct
+from collections import OrderedDict
+
+import stats
+
+
+# Типы объектов в pack-файле
+OBJ_COMMIT = 1
+OBJ_TREE = 2
+OBJ_BLOB = 3
+OBJ_TAG = 4
+OBJ_OFS_DELTA = 6
+OBJ_REF_DELTA = 7
+
+TYPE_NAMES = {OBJ_COMMIT: 'commit', OBJ_TREE: 'tree', OBJ_BLOB: 'blob', OBJ_TAG: 'tag'}
+TYPE_IDS = {name: obj_type for obj_type, name in TYPE_NAMES.items()}
+
+IDX_V2_MAGIC = b'\xfftOc'
+
+
+# Функция открытия файла только для чтения через mmap
+def map_file(path):
+    with open(path, 'rb') as f:
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+# Функция чтения целого числа переменной длины из заголовка дельты
+def _read_varint(data, index):
+    value = shift = 0
+    while True:
+        byte = data[index]
+        index += 1
+        value |= (byte & 0x7f) << shift
+        shift += 7
+        if not byte & 0x80:
+            return value, index
+
+
+# Функция применения дельты к базовому объекту
+def apply_delta(base, delta):
+    source_size, index = _read_varint(delta, 0)
+    target_size, index = _read_varint(delta, index)
+    if source_size != len(base):
+        raise ValueError(f"Размер базы дельты не совпадает: {source_size} != {len(base)}")
+
+    result = bytearray()
+    while index < len(delta):
+        opcode = delta[index]
+        index += 1
+        if opcode & 0x80:  # копирование из базы
+            offset = size = 0
+            for i in range(4):
+                if opcode & (1 << i):
+                    offset |= delta[index] << (8 * i)
+                    index += 1
+            for i in range(3):
+                if opcode & (1 << (4 + i)):
+                    size |= delta[index] << (8 * i)
+                    index += 1
+            result += base[offset:offset + (size or 0x10000)]
+        elif opcode:  # вставка новых данных
+            result += delta[index:index + opcode]
+            index += opcode
+        else:
+            raise ValueError("Некорректная инструкция дельты")
+
+    if len(result) != target_size:
+        raise ValueError(f"Размер результата дельты не совпадает: {len(result)} != {target_size}")
+    return bytes(result)
+
+
+class PackIndex:
+    """Индекс pack-файла (.idx версий 1 и 2), отображённый в память."""
+
+    def __init__(self, path):
+        self.path = path
+        self.data = map_file(path)
+        if self.data[:4] == IDX_V2_MAGIC:
+            version = struct.unpack_from('>I', self.data, 4)[0]
+            if version != 2:
+                raise ValueError(f"Неподдерживаемая версия индекса {version}: {path}")
+            self.version = 2
+            fanout_start = 8
+        else:
+            self.version = 1
+            fanout_start = 0
+
+        self.fanout = struct.unpack_from('>256I', self.data, fanout_start)
+        self.count = self.fanout[255]
+        table_start = fanout_start + 256 * 4
+        if self.version == 2:
+            self.sha_start = table_start
+            self.sha_stride = 20
+            self.offset_start = table_start + self.count * 24  # после SHA и CRC32
+            self.large_offset_start = self.offset_start + self.count * 4
+        else:
+            self.sha_start = table_start + 4
+            self.sha_stride = 24
+
+    def _sha_at(self, position):
+        start = self.sha_start + position * self.sha_stride
+        return self.data[start:start + 20]
+
+    def _offset_at(self, position):
+        if self.version == 1:
+            return struct.unpack_from('>I', self.data, self.sha_start - 4 + position * 24)[0]
+        offset = struct.unpack_from('>I', self.data, self.offset_start + position * 4)[0]
+        if offset & 0x80000000:  # смещение хранится в таблице 64-битных смещений
+            large = self.large_offset_start + (offset & 0x7fffffff) * 8
+            offset = struct.unpack_from('>Q', self.data, large)[0]
+        return offset
+
+    def find(self, sha):
+        """Возвращает смещение объекта в pack-файле или None (sha — 20 байт)."""
+        first = sha[0]
+        low = self.fanout[first - 1] if first else 0
+        high = self.fanout[first]
+        while low < high:
+            middle = (low + high) // 2
+            current = self._sha_at(middle)
+            if current < sha:
+                low = middle + 1
+            elif current > sha:
+                high = middle
+            else:
+                return self._offset_at(middle)
+        return None
+
+    def __iter__(self):
+        """Перебирает SHA всех объектов индекса в порядке возрастания."""
+        for position in range(self.count):
+            yield self._sha_at(position)
+
+    def close(self):
+        self.data.close()
+
+
+class Packfile:
+    """Pack-файл, отображённый в память, с разрешением цепочек дельт."""
+
+    def __init__(self, store, pack_path, index_path):
+        self.store = store
+        self.path = pack_path
+        self.index = PackIndex(index_path)
+        self.data = map_file(pack_path)
+        self.view = memoryview(self.data)
+        if self.data[:4] != b'PACK':
+            raise ValueError(f"Некорректная сигнатура pack-файла: {pack_path}")
+
+    # Функция чтения заголовка объекта: тип, распакованный размер и начало данных
+    def _read_header(self, offset):
+        byte = self.data[offset]
+        offset += 1
+        obj_type = (byte >> 4) & 0x07
+        size = byte & 0x0f
+        shift = 4
+        while byte & 0x80:
+            byte = self.data[offset]
+            offset += 1
+            size |= (byte & 0x7f) << shift
+            shift += 7
+        return obj_type, size, offset
+
+    # Функция распаковки zlib-потока, начинающегося с указанного смещения
+    def _inflate(self, offset, size):
+        self.store.inflated += 1
+        collector = stats.active
+        if collector is not None:
+            collector.enter('inflate')
+        start = offset
+        decompressor = zlib.decompressobj()
+        chunk = max(size, 1024)
+        parts = []
+        while not decompressor.eof:
+            if offset >= len(self.data):
+                raise ValueError(f"Обрыв zlib-потока в pack-файле: {self.path}")
+            parts.append(decompressor.decompress(self.view[offset:offset + chunk]))
+            offset += chunk
+        data = b''.join(parts)
+        if collector is not None:
+            collector.exit('inflate')
+            collector.count('bytes.compressed', offset - start - len(decompressor.unused_data))
+            collector.count('bytes.inflated', len(data))
+        if len(data) != size:
+            raise ValueError(f"Размер объекта не совпадает с заголовком в pack-файле: {self.path}")
+        return data
+
+    # Функция чтения смещения базы для OFS_DELTA
+    def _read_base_offset(self, offset):
+        byte = self.data[offset]
+        offset += 1
+        value = byte & 0x7f
+        while byte & 0x80:
+            byte = self.data[offset]
+            offset += 1
+            value = ((value + 1) << 7) | (byte & 0x7f)
+        return value, offset
+
+    def read_at(self, offset):
+        """Возвращает (тип, данные) объекта по смещению, разрешая цепочку дельт."""
+        cache = self.store.delta_cache
+        chain = []  # данные дельт от верхней к базе
+        while True:
+            cached = cache.get((self.path, offset))
+            if cached is not None:
+                obj_type, data = cached
+                break
+
+            obj_type, size, data_offset = self._read_header(offset)
+            if obj_type == OBJ_OFS_DELTA:
+                distance, data_offset = self._read_base_offset(data_offset)
+                chain.append((offset, self._inflate(data_offset, size)))
+                offset -= distance
+            elif obj_type == OBJ_REF_DELTA:
+                base_sha = bytes(self.data[data_offset:data_offset + 20])
+                chain.append((offset, self._inflate(data_offset + 20, size)))
+                base = self.store.read_raw(base_sha)
+                if base is None:
+                    raise ValueError(f"База REF_DELTA {base_sha.hex()} не найдена")
+                obj_type, data = base
+                break
+            elif obj_type in TYPE_NAMES:
+                data = self._inflate(data_offset, size)
+                if chain:  # запоминаем только базы дельт
+                    cache.put((self.path, offset), (obj_type, data))
+                break
+            else:
+                raise ValueError(f"Неизвестный тип объекта {obj_type} в pack-файле: {self.path}")
+
+        # Применяем дельты от базы к искомому объекту
+        if chain and stats.active is not None:
+            stats.active.count('objects.delta', len(chain))
+        for position in range(len(chain) - 1, -1, -1):
+            delta_offset, delta = chain[position]
+            data = apply_delta(data, delta)
+            if position:
+                cache.put((self.path, delta_offset), (obj_type, data))
+        return obj_type, data
+
+    def close(self):
+        self.view.release()
+        self.data.close()
+        self.index.close()
+
+
+class DeltaBaseCache:
+    """LRU-кэш баз дельт, ограниченный суммарным размером данных."""
+
+    def __init__(self, max_bytes=32 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.entries = OrderedDict()
+
+    def get(self, key):
+        value = self.entries.get(key)
+        if value is not None:
+            self.entries.move_to_end(key)
+        if stats.active is not None:
+            stats.active.count('delta_cache.hit' if value is not None else 'delta_cache.miss')
+        return value
+
+    def put(self, key, value):
+        if key in self.entries or len(value[1]) > self.max_bytes:
+            return
+        self.entries[key] = value
+        self.size += len(value[1])
+        while self.size > self.max_bytes:
+            _, (_, old) = self.entries.popitem(last=False)
+            self.size -= len(old)
+
+
+class ObjectStore:
+    """Хранилище объектов Git: loose-объекты и pack-файлы."""
+
+    def __init__(self, repo_path, delta_cache_bytes=32 * 1024 * 1024):
+        self.git_dir = os.path.join(repo_path, '.git')
+        self.objects_dir = os.path.join(self.git_dir, 'objects')
+        self.delta_cache = DeltaBaseCache(delta_cache_bytes)
+        self.packs = []
+        self.inflated = 0  # число распакованных zlib-потоков (объекты и дельты), для замеров
+        self.refresh()
+
+    def refresh(self):
+        """Перечитывает список pack-файлов (например, после git gc)."""
+        pack_dir = os.path.join(self.objects_dir, 'pack')
+        known = {pack.path for pack in self.packs}
+        if not os.path.isdir(pack_dir):
+            return
+        for name in sorted(os.listdir(pack_dir)):
+            if not name.endswith('.idx'):
+                continue
+            pack_path = os.path.join(pack_dir, name[:-4] + '.pack')
+            if pack_path in known or not os.path.isfile(pack_path):
+                continue
+            self.packs.append(Packfile(self, pack_path, os.path.join(pack_dir, name)))
+
+    def read_raw(self, sha):
+        """Возвращает (числовой тип, данные) объекта по 20-байтовому SHA или None."""
+        if stats.active is not None:
+            with stats.active.phase('object_read'):
+                result = self._read_raw(sha)
+            if result is not None:
+                stats.active.count(f'objects.{TYPE_NAMES[result[0]]}')
+            return result
+        return self._read_raw(sha)
+
+    def _read_raw(self, sha):
+        hex_sha = sha.hex()
+        path = os.path.join(self.objects_dir, hex_sha[:2], hex_sha[2:])
+        if os.path.isfile(path):
+            with open(path, 'rb') as f:
+                compressed = f.read()
+            collector = stats.active
+            if collector is not None:
+                collector.enter('inflate')
+            data = zlib.decompress(compressed)
+            self.inflated += 1
+            if collector is not None:
+                collector.exit('inflate')
+                collector.count('objects.loose')
+                collector.count('bytes.compressed', len(compressed))
+                collector.count('bytes.inflated', len(data))
+            header_end = data.index(b'\0')
+            obj_type = data[:header_end].split(b' ')[0].decode()
+            return TYPE_IDS[obj_type], data[header_end + 1:]
+
+        for pack in self.packs:
+            offset = pack.index.find(sha)
+            if offset is not None:
+                if stats.active is not None:
+                    stats.active.count('objects.packed')
+                return pack.read_at(offset)
+        return None
+
+    def has_object(self, hex_sha):
+        """Проверяет наличие объекта без его распаковки."""
+        if os.path.isfile(os.path.join(self.objects_dir, hex_sha[:2], hex_sha[2:])):
+            return True
+        try:
+            sha = bytes.fromhex(hex_sha)
+        except ValueError:
+            return False
+        return len(sha) == 20 and any(pack.index.find(sha) is not None for pack in self.packs)
+
+    def read(self, hex_sha):
+        """Возвращает (тип, данные) объекта по hex-SHA или (None, None), если объект не найден."""
+        try:
+            sha = bytes.fromhex(hex_sha)
+        except ValueError:
+            return None, None
+        if len(sha) != 20:
+            return None, None
+        result = self.read_raw(sha)
+        if result is None:
+            return None, None
+        return TYPE_NAMES[result[0]], result[1]
+
+    def close(self):
+        for pack in self.packs:
+            pack.close()
+        self.packs = []
+
@@ -0,0 +1,131 @@
+import os
+import sys
+import json
+import hashlib
+import tempfile
+
+
+CACHE_VERSION = 2  # 2: имена файлов без ведущего пробела (исправлен разбор режима записей дерева)
+
+
+class HistoryCache:
+    """Кэш обработанных коммитов на диске: дерево, родители, сообщение и изменённые файлы по SHA.
+
+    Файл состоит из строк JSON: заголовок (версия, вид кэша, вершины ссылок), по строке
+    на коммит и завершающая строка с контрольной суммой всех предыдущих строк.
+    Повреждённый, обрезанный или устаревший файл отбрасывается, и кэш строится заново.
+    """
+
+    def __init__(self, path, kind):
+        self.path = path
+        self.kind = kind    # разные генераторы по-разному считают изменённые файлы
+        self.commits = {}   # SHA -> (дерево, родители, сообщение, изменённые файлы)
+        self.tips = {}      # ссылка -> SHA, увиденные при прошлом запуске
+        self.new_commits = []
+
+    @staticmethod
+    def default_path(repo_path, kind, cache_dir=None):
+        """Путь к файлу кэша: по умолчанию внутри .git анализируемого репозитория."""
+        cache_dir = cache_dir or os.path.join(repo_path, '.git')
+        return os.path.join(cache_dir, f'graph-cache-{kind}.jsonl')
+
+    def load(self, has_object=None):
+        """Читает кэш с диска. Возвращает False, если кэша нет или он был отброшен."""
+        self.commits = {}
+        self.tips = {}
+        self.new_commits = []
+        if not os.path.isfile(self.path):
+            return False
+        try:
+            commits, tips = self._read()
+        except (OSError, ValueError, TypeError, KeyError, AttributeError) as e:
+            print(f"Кэш истории {self.path} повреждён и будет перестроен: {e}", file=sys.stderr)
+            return False
+
+        # Кэш от другого репозитория или после пересоздания истории: ни одной вершины нет среди объектов
+        if has_object is not None and tips and not any(has_object(sha) for sha in tips.values()):
+            print(f"Кэш истории {self.path} устарел и будет перестроен.", file=sys.stderr)
+            return False
+
+        self.commits = commits
+        self.tips = tips
+        return True
+
+    def _read(self):
+        checksum = hashlib.sha1()
+        commits = {}
+        with open(self.path, 'rb') as f:
+            header_line = f.readline()
+            checksum.update(header_line)
+            header = json.loads(header_line)
+            if header.get('version') != CACHE_VERSION or header.get('kind') != self.kind:
+                raise ValueError("несовпадение версии или вида кэша")
+
+            for line in f:
+                if line.startswith(b'{'):  # завершающая строка
+                    if json.loads(line)['checksum'] != checksum.hexdigest():
+                        raise ValueError("несовпадение контрольной суммы")
+                    break
+                checksum.update(line)
+                commit_hash, tree_hash, parents, name, changed_files = json.loads(line)
+                commits[commit_hash] = (tree_hash, parents, name, changed_files)
+            else:
+                raise ValueError("файл обрезан")
+
+        if len(commits) != header['count']:
+            raise ValueError("число записей не совпадает с заголовком")
+        return commits, dict(header['tips'])
+
+    def get(self, commit_hash):
+        return self.commits.get(commit_hash)
+
+    def add(self, commit_hash, tree_hash, parents, name, changed_files):
+        if commit_hash not in self.commits:
+            self.commits[commit_hash] = (tree_hash, list(parents), name, list(changed_files))
+            self.new_commits.append(commit_hash)
+
+    def iter_records(self, commit_hashes=None):
+        """Перебирает записи (SHA, сообщение, файлы, родители) в порядке хранения."""
+        for commit_hash, (tree_hash, parents, name, changed_files) in self.commits.items():
+            if commit_hashes is None or commit_hash in commit_hashes:
+                yield commit_hash, name, changed_files, parents
+
+    def save(self, tips):
+        """Атомарно записывает кэш: новые коммиты первыми, затем ранее сохранённые."""
+        new_commits = set(self.new_commits)
+        order = self.new_commits + [commit_hash for commit_hash in self.commits if commit_hash not in new_commits]
+        checksum = hashlib.sha1()
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        # Уникальное временное имя: одновременные запуски не пишут в один и тот же файл
+        fd, temp_path = tempfile.mkstemp(prefix=os.path.basename(self.path) + '.', suffix='.tmp', dir=directory)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                def write(line):
+                    line = (json.dumps(line, ensure_ascii=False, separators=(',', ':')) + '\n').encode('utf-8')
+                    checksum.update(line)
+                    f.write(line)
+
+                write({'version': CACHE_VERSION, 'kind': self.kind, 'tips': tips, 'count': len(order)})
+                for commit_hash in order:
+                    write([commit_hash, *self.commits[commit_hash]])
+                f.write((json.dumps({'checksum': checksum.hexdigest()}) + '\n').encode('utf-8'))
+            os.replace(temp_path, self.path)
+        except BaseException:
+            os.remove(temp_path)
+            raise
+
+        self.commits = {commit_hash: self.commits[commit_hash] for commit_hash in order}
+        self.tips = dict(tips)
+        self.new_commits = []
+
+
+
+# Функция открытия кэша истории по настройкам из config.ini (None, если кэш отключён)
+def open_history_cache(settings, repo_path, kind, has_object=None):
+    if not settings.getboolean('use_cache', fallback=True):
+        return None
+    path = HistoryCache.default_path(repo_path, kind, settings.get('cache_dir', fallback=None))
+    cache = HistoryCache(path, kind)
+    cache.load(has_object)
+    return cache
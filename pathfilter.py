@@ -0,0 +1,57 @@
+from bloom import key_hashes, path_keys
+
+
+SKIP, PARTIAL, INSIDE = 0, 1, 2  # путь вне фильтра, на пути к запрошенному поддереву, внутри него
+
+
+class PathFilter:
+    """Ограничение истории путями, как `git log -- folder3/ 1.txt`.
+
+    Путь задаёт файл или каталог целиком. Сравнение деревьев с фильтром раскрывает
+    только поддеревья, лежащие на пути к запрошенным (PARTIAL), и поддеревья внутри
+    них (INSIDE); остальные записи дерева не читаются.
+    """
+
+    def __init__(self, paths):
+        specs = []
+        for path in paths:
+            path = path.encode('utf-8') if isinstance(path, str) else path
+            path = path.strip(b'/')
+            while path.startswith(b'./'):
+                path = path[2:]
+            specs.append(b'' if path == b'.' else path)
+        if not specs:
+            raise ValueError("Не задано ни одного пути")
+        self.paths = tuple(dict.fromkeys(specs))  # пустой путь — весь репозиторий
+        self.prefixes = tuple(spec + b'/' for spec in self.paths)
+        # Хеши путей для индекса изменённых путей; весь репозиторий индекс не сужает
+        self.bloom_hashes = None if b'' in self.paths else [[key_hashes(key) for key in path_keys([spec])] for spec in self.paths]
+
+    # Функция определения положения пути (байты, без завершающего '/') относительно фильтра
+    def match(self, path):
+        result = SKIP
+        for spec, prefix in zip(self.paths, self.prefixes):
+            if not spec or path == spec or path.startswith(prefix):
+                return INSIDE
+            if spec.startswith(path + b'/'):
+                result = PARTIAL
+        return result
+
+    # Функция проверки пути-строки из списка изменённых файлов
+    def matches(self, path):
+        return self.match(path.encode('utf-8')) == INSIDE
+
+    # Функция отбора записей дерева {имя: (является ли деревом, SHA)}: файлы — только внутри фильтра,
+    # поддеревья — и на пути к нему. Возвращает (записи, {имя: фильтр для поддерева или None})
+    def restrict(self, entries, prefix):
+        selected = {}
+        scopes = {}
+        for name, entry in entries.items():
+            match = self.match(prefix + name)
+            if match == INSIDE or (match == PARTIAL and entry[0]):
+                selected[name] = entry
+                scopes[name] = None if match == INSIDE else self
+        return selected, scopes
+
+    def __repr__(self):
+        return f"PathFilter({[spec.decode('utf-8', errors='replace') for spec in self.paths]})"
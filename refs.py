@@ -0,0 +1,172 @@
+import os
+import re
+
+
+MAX_SYMREF_DEPTH = 5  # как и в Git, ограничиваем цепочки символических ссылок
+ANCESTRY_SUFFIX = re.compile(r'(?:[~^]\d*)+$')  # суффиксы предков: master~2, HEAD^2, v1^^
+
+
+class RefStore:
+    """Ссылки репозитория: loose-файлы в .git/refs, packed-refs и HEAD.
+
+    Все пути строятся от repo_path, текущий каталог процесса не меняется, поэтому
+    объект можно использовать из потоков и долгоживущих сервисов.
+    """
+
+    def __init__(self, repo_path, store):
+        self.git_dir = os.path.join(repo_path, '.git')
+        self.store = store  # ObjectStore: нужен для раскрытия аннотированных тегов
+
+    def read_packed_refs(self):
+        """Возвращает {имя: (SHA, раскрытый SHA или None)} из файла packed-refs."""
+        refs = {}
+        path = os.path.join(self.git_dir, 'packed-refs')
+        if not os.path.isfile(path):
+            return refs
+        last = None
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.rstrip('\n')
+                if not line or line.startswith('#'):
+                    continue
+                if line.startswith('^'):  # раскрытое значение предыдущего тега
+                    if last is not None:
+                        refs[last] = (refs[last][0], line[1:])
+                    continue
+                sha, name = line.split(' ', 1)
+                refs[name] = (sha, None)
+                last = name
+        return refs
+
+    def read_loose_refs(self):
+        """Возвращает {имя: содержимое файла} для всех файлов в .git/refs."""
+        refs = {}
+        refs_dir = os.path.join(self.git_dir, 'refs')
+        for directory, _, files in os.walk(refs_dir):
+            for name in files:
+                if name.endswith('.lock'):
+                    continue
+                path = os.path.join(directory, name)
+                refname = os.path.relpath(path, self.git_dir).replace(os.sep, '/')
+                try:
+                    with open(path, 'r', encoding='utf-8') as f:
+                        refs[refname] = f.read().strip()
+                except (OSError, UnicodeDecodeError):
+                    continue
+        return refs
+
+    def _read_ref(self, name, packed):
+        path = os.path.join(self.git_dir, *name.split('/'))
+        if os.path.isfile(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                return f.read().strip()
+        if name in packed:
+            return packed[name][0]
+        return None
+
+    def resolve(self, name, packed=None):
+        """Возвращает SHA, на который указывает ссылка (с учётом символических ссылок), или None."""
+        packed = self.read_packed_refs() if packed is None else packed
+        for _ in range(MAX_SYMREF_DEPTH):
+            value = self._read_ref(name, packed)
+            if value is None:
+                return None
+            if not value.startswith('ref:'):
+                return value
+            name = value[4:].strip()
+        return None
+
+    def expand(self, name, packed=None):
+        """Находит полное имя ссылки по сокращённому, в порядке поиска Git (master -> refs/heads/master)."""
+        packed = self.read_packed_refs() if packed is None else packed
+        for candidate in (name, f'refs/{name}', f'refs/tags/{name}', f'refs/heads/{name}',
+                          f'refs/remotes/{name}', f'refs/remotes/{name}/HEAD'):
+            if self.resolve(candidate, packed) is not None:
+                return candidate
+        return None
+
+    def peel(self, sha, peeled=None):
+        """Раскрывает аннотированные теги до коммита. Возвращает None для тегов на деревья и файлы."""
+        if peeled:
+            sha = peeled
+        for _ in range(MAX_SYMREF_DEPTH):
+            obj_type, content = self.store.read(sha)
+            if obj_type == 'commit':
+                return sha
+            if obj_type != 'tag':
+                return None
+            sha = content.split(b'\n', 1)[0].split()[1].decode()  # строка "object <sha>"
+        return None
+
+    def all_refs(self):
+        """Возвращает {имя: SHA коммита} для HEAD и всех ссылок (loose-ссылки важнее packed-refs)."""
+        packed = self.read_packed_refs()
+        names = dict.fromkeys(['HEAD', *sorted(set(packed) | set(self.read_loose_refs()))])
+        tips = {}
+        for name in names:
+            sha = self.resolve(name, packed)
+            if sha is None:
+                continue
+            loose = os.path.isfile(os.path.join(self.git_dir, *name.split('/')))
+            commit = self.peel(sha, None if loose or name not in packed else packed[name][1])
+            if commit is not None:
+                tips[name] = commit
+        return tips
+
+    def parents(self, sha):
+        obj_type, content = self.store.read(sha)
+        if obj_type != 'commit':
+            raise KeyError(f"Коммит не найден: {sha}")
+        parents = []
+        for line in content.split(b'\n'):
+            if line.startswith(b'parent '):
+                parents.append(line[7:].decode())
+            elif not line.startswith(b'tree '):
+                break
+        return parents
+
+    def ancestor(self, sha, suffix):
+        """Переходит от коммита к предку по суффиксу вида ~N и ^N, как в git rev-parse."""
+        for operator, count in re.findall(r'([~^])(\d*)', suffix):
+            count = int(count) if count else 1
+            if operator == '~':
+                for _ in range(count):
+                    parents = self.parents(sha)
+                    if not parents:
+                        raise KeyError(f"У коммита {sha} нет родителя")
+                    sha = parents[0]
+            elif count:
+                parents = self.parents(sha)
+                if count > len(parents):
+                    raise KeyError(f"У коммита {sha} нет родителя номер {count}")
+                sha = parents[count - 1]
+        return sha
+
+    def select_tips(self, names=None):
+        """Возвращает {имя: SHA коммита} для выбранных ссылок или SHA; None — все ссылки и HEAD.
+
+        Имена могут содержать суффиксы предков (master~3, HEAD^2).
+        """
+        if not names:
+            return self.all_refs()
+        packed = self.read_packed_refs()
+        tips = {}
+        for name in names:
+            match = ANCESTRY_SUFFIX.search(name)
+            if match and match.start() > 0:
+                base = self.select_tips([name[:match.start()]])
+                if base:
+                    full_name, commit = next(iter(base.items()))
+                    tips[full_name + match.group()] = self.ancestor(commit, match.group())
+                continue
+            full_name = self.expand(name, packed)
+            if full_name is not None:
+                sha = self.resolve(full_name, packed)
+            elif self.store.has_object(name):
+                full_name, sha = name, name  # прямой SHA коммита или тега
+            else:
+                raise KeyError(f"Ссылка не найдена: {name}")
+            commit = self.peel(sha)
+            if commit is not None:
+                tips[full_name] = commit
+        return tips
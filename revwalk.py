@@ -0,0 +1,92 @@
+import heapq
+from datetime import datetime
+
+
+INFINITE_GENERATION = 0xffffffff
+
+
+# Функция разбора списка ревизий в стиле git rev-list: "A..B", "^A", "B"
+def parse_revisions(revisions):
+    include = []
+    exclude = []
+    for revision in revisions:
+        if '..' in revision:
+            start, end = revision.split('..', 1)
+            exclude.append(start or 'HEAD')
+            include.append(end or 'HEAD')
+        elif revision.startswith('^'):
+            exclude.append(revision[1:])
+        else:
+            include.append(revision)
+    return include, exclude
+
+
+# Функция перевода даты (метка времени Unix или ISO 8601) в метку времени
+def parse_date(value):
+    if value is None:
+        return None
+    if isinstance(value, (int, float)) or value.isdigit():
+        return int(value)
+    return int(datetime.fromisoformat(value).timestamp())
+
+
+def walk_range(include, exclude, read_commit, max_count=None, since=None, until=None):
+    """Лениво обходит коммиты, достижимые из include и недостижимые из exclude.
+
+    read_commit(sha) возвращает (SHA родителей, время коммита, номер поколения или None)
+    либо None для отсутствующего коммита. Очередь с приоритетом упорядочена по номеру
+    поколения (тогда исключение A..B точное), а при равных или неизвестных поколениях — по
+    дате коммита, как в git rev-list. Коммиты отдаются от новых к старым; обход
+    прекращается, как только выдано max_count коммитов, все коммиты в очереди исключены
+    или оставшиеся коммиты старше since.
+    """
+    since = parse_date(since)
+    until = parse_date(until)
+    queue = []          # (-поколение, -время, номер вставки, SHA)
+    flags = {}          # SHA -> исключён ли коммит (достижим из exclude)
+    meta = {}           # SHA -> (родители, время, поколение) для коммитов в очереди
+    interesting = 0     # число неисключённых коммитов в очереди
+    counter = 0
+    emitted = 0
+
+    def push(sha, uninteresting):
+        nonlocal counter, interesting
+        if sha in flags:
+            if uninteresting and not flags[sha]:
+                flags[sha] = True
+                if sha in meta:
+                    interesting -= 1
+            return
+        record = read_commit(sha)
+        if record is None:
+            return
+        flags[sha] = uninteresting
+        meta[sha] = record
+        parents, commit_time, generation = record
+        # Коммиты вне commit-graph новее всех коммитов графа: ставим их первыми
+        heapq.heappush(queue, (-(generation if generation is not None else INFINITE_GENERATION), -commit_time, counter, sha))
+        counter += 1
+        if not uninteresting:
+            interesting += 1
+
+    for sha in exclude:
+        push(sha, True)
+    for sha in include:
+        push(sha, False)
+
+    while queue and interesting:
+        sha = heapq.heappop(queue)[3]
+        parents, commit_time, generation = meta.pop(sha)
+        uninteresting = flags[sha]
+        if not uninteresting:
+            interesting -= 1
+        if since is not None and commit_time < since and not uninteresting:
+            continue  # слишком старый коммит: его предков не раскрываем
+        for parent in parents:
+            push(parent, uninteresting)
+        if uninteresting or (until is not None and commit_time > until):
+            continue
+        yield sha
+        emitted += 1
+        if max_count is not None and emitted >= max_count:
+            return
@@ -0,0 +1,173 @@
+import sys
+import json
+import time
+import cProfile
+import tracemalloc
+from collections import Counter
+from contextlib import contextmanager, nullcontext
+
+
+# Включённый сборщик статистики. None — инструментирование выключено: горячие участки
+# кода проверяют только `stats.active is None` и ничего не считают
+active = None
+
+
+class Stats:
+    """Счётчики и таймеры фаз одного запуска.
+
+    Время фаз считается без вложенных фаз: пока открыта вложенная фаза (например,
+    inflate внутри tree_parse), время идёт ей, а не внешней. Поэтому сумма фаз не
+    превышает общее время работы, а остаток выводится как "other".
+    """
+
+    def __init__(self):
+        self.counters = Counter()  # имя -> значение (объекты, байты, попадания в кэши)
+        self.timers = Counter()    # фаза -> секунды без вложенных фаз
+        self.stack = []            # открытые фазы: [имя, момент начала текущего отрезка]
+        self.started = time.perf_counter()
+        self.extra = {}            # дополнительные разделы отчёта (tracemalloc)
+
+    def count(self, name, value=1):
+        self.counters[name] += value
+
+    def enter(self, name):
+        now = time.perf_counter()
+        if self.stack:
+            outer = self.stack[-1]
+            self.timers[outer[0]] += now - outer[1]
+        self.stack.append([name, now])
+
+    def exit(self, name):
+        """Закрывает фазу name; фазы, оставшиеся открытыми из-за исключения, закрываются вместе с ней."""
+        now = time.perf_counter()
+        while self.stack:
+            current, start = self.stack.pop()
+            self.timers[current] += now - start
+            if current == name:
+                break
+        if self.stack:
+            self.stack[-1][1] = now
+
+    @contextmanager
+    def phase(self, name):
+        self.enter(name)
+        try:
+            yield
+        finally:
+            self.exit(name)
+
+    def iterate(self, name, iterable):
+        """Отдаёт элементы iterable, относя время их получения к фазе name (для потоковых генераторов)."""
+        iterator = iter(iterable)
+        while True:
+            self.enter(name)
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            finally:
+                self.exit(name)
+            yield item
+
+    def take(self):
+        """Возвращает накопленные счётчики и таймеры и обнуляет их (для передачи из рабочего процесса)."""
+        snapshot = dict(self.counters), dict(self.timers)
+        self.counters.clear()
+        self.timers.clear()
+        return snapshot
+
+    def merge(self, snapshot, prefix='workers.'):
+        """Добавляет статистику рабочего процесса; его фазы идут параллельно, поэтому пишутся с префиксом."""
+        counters, timers = snapshot
+        self.counters.update(counters)
+        for name, seconds in timers.items():
+            self.timers[prefix + name] += seconds
+
+    def summary(self):
+        wall_time = time.perf_counter() - self.started
+        phases = {name: round(seconds, 6) for name, seconds in sorted(self.timers.items())}
+        own = sum(seconds for name, seconds in self.timers.items() if not name.startswith('workers.'))
+        phases['other'] = round(max(wall_time - own, 0.0), 6)
+        return {'wall_time_s': round(wall_time, 6), 'phases': phases,
+                'counters': dict(sorted(self.counters.items())), **self.extra}
+
+
+# Функция получения контекста фазы (пустого, если инструментирование выключено)
+def phase(name):
+    return active.phase(name) if active is not None else nullcontext()
+
+
+# Функция учёта времени потокового генератора (без обёртки, если инструментирование выключено)
+def iterate(name, iterable):
+    return active.iterate(name, iterable) if active is not None else iterable
+
+
+# Функция увеличения счётчика (ничего не делает, если инструментирование выключено)
+def count(name, value=1):
+    if active is not None:
+        active.count(name, value)
+
+
+# Функция записи отчёта в файл или в stderr ('-')
+def write_summary(summary, path):
+    text = json.dumps(summary, ensure_ascii=False, indent=2)
+    if path == '-':
+        print(text, file=sys.stderr)
+    else:
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(text + '\n')
+
+
+@contextmanager
+def session(stats_path=None, profile_path=None, trace_memory=False, top=10):
+    """Включает инструментирование на время блока.
+
+    stats_path — куда записать JSON-отчёт ('-' — stderr), profile_path — файл для данных
+    cProfile (читается `python -m pstats`), trace_memory — пик памяти и top мест
+    выделения по tracemalloc в отчёте. Без параметров ничего не включается.
+    """
+    global active
+    if stats_path is None and profile_path is None and not trace_memory:
+        yield None
+        return
+    if trace_memory and stats_path is None:
+        stats_path = '-'  # данные tracemalloc выводятся только в отчёте
+
+    active = collector = Stats()
+    profiler = cProfile.Profile() if profile_path else None
+    if trace_memory:
+        tracemalloc.start()
+    if profiler is not None:
+        profiler.enable()
+    try:
+        yield collector
+    finally:
+        if profiler is not None:
+            profiler.disable()
+            profiler.dump_stats(profile_path)
+        if trace_memory:
+            current, peak = tracemalloc.get_traced_memory()
+            snapshot = tracemalloc.take_snapshot()
+            tracemalloc.stop()
+            collector.extra['tracemalloc'] = {
+                'current_bytes': current,
+                'peak_bytes': peak,
+                'top': [{'location': str(statistic.traceback), 'bytes': statistic.size, 'count': statistic.count}
+                        for statistic in snapshot.statistics('lineno')[:top]],
+            }
+        active = None
+        if stats_path is not None:
+            write_summary(collector.summary(), stats_path)
+
+
+# Функция добавления флагов --stats, --profile и --tracemalloc в разбор аргументов
+def add_arguments(parser):
+    parser.add_argument("--stats", nargs='?', const='-', metavar='FILE',
+                        help="Вывести JSON-отчёт о чтении объектов, кэшах и времени фаз (в stderr или в FILE)")
+    parser.add_argument("--profile", metavar='FILE', help="Записать профиль cProfile в FILE")
+    parser.add_argument("--tracemalloc", action='store_true', help="Добавить в отчёт пик памяти по tracemalloc")
+
+
+# Функция включения инструментирования по разобранным аргументам
+def session_from_args(args):
+    return session(args.stats, args.profile, args.tracemalloc)
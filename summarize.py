@@ -0,0 +1,140 @@
+from array import array
+from collections import deque
+
+from emitters import node_id
+
+
+# Функция получения строк родителей, оставшихся в сводном графе
+def _parent_rows(dag, row, first_parent, selected):
+    rows = [dag.rows[parent] for parent in dag.parents(row)]
+    if first_parent:
+        rows = rows[:1]  # как git log --first-parent: вторые родители слияний не раскрываются
+    return [parent for parent in rows if parent >= 0 and (selected is None or selected[parent])]
+
+
+# Функция отбора строк графа, достижимых из вершин не глубже max_depth
+def select_rows(dag, tips=None, max_depth=None, first_parent=False):
+    """Возвращает bytearray-маску выбранных строк или None, если выбраны все строки."""
+    count = len(dag)
+    if max_depth is None and not first_parent:
+        return None
+    if tips is None:  # вершины — коммиты без потомков в графе
+        has_children = bytearray(count)
+        for row in range(count):
+            for parent in _parent_rows(dag, row, False, None):
+                has_children[parent] = 1
+        start = [row for row in range(count) if not has_children[row]]
+    else:
+        start = [row for row in (dag.row(commit_hash) for commit_hash in tips) if row is not None]
+
+    selected = bytearray(count)
+    depth = array('i', [-1]) * count
+    queue = deque()
+    for row in start:
+        if depth[row] < 0:
+            depth[row] = 0
+            queue.append(row)
+    while queue:
+        row = queue.popleft()
+        selected[row] = 1
+        if max_depth is not None and depth[row] + 1 >= max_depth:
+            continue  # глубина считается в коммитах от ближайшей вершины
+        for parent in _parent_rows(dag, row, first_parent, None):
+            if depth[parent] < 0:
+                depth[parent] = depth[row] + 1
+                queue.append(parent)
+    return selected
+
+
+# Функция отбора коммитов графа с переписыванием родителей, как в `git log -- path`
+def filter_commits(dag, keep):
+    """Отдаёт записи (SHA, сообщение, файлы, SHA родителей) строк, для которых keep(row) истинно.
+
+    Записи идут от предков к потомкам; родителями записи становятся ближайшие оставленные
+    предки, поэтому граф остаётся связным без отброшенных коммитов.
+    """
+    count = len(dag)
+    state = bytearray(count)  # 1 — родители в обработке, 2 — строка обработана
+    ancestors = [None] * count
+    for start in range(count):
+        stack = [start]
+        while stack:
+            row = stack[-1]
+            if state[row] == 0:
+                state[row] = 1
+                stack.extend(parent for parent in _parent_rows(dag, row, False, None) if not state[parent])
+                continue
+            stack.pop()
+            if state[row] == 2:
+                continue
+            state[row] = 2
+            parents = list(dict.fromkeys(ancestor for parent in _parent_rows(dag, row, False, None) for ancestor in ancestors[parent]))
+            if keep(row):
+                ancestors[row] = (row,)
+                commit_hash, message, changed_files, _ = dag.record(row)
+                yield commit_hash, message, changed_files, [dag.sha(dag.row_ids[parent]) for parent in parents]
+            else:
+                ancestors[row] = parents
+
+
+def collapse_chains(dag, tips=None, max_depth=None, first_parent=False, min_run=2, with_files=True):
+    """Отдаёт записи (SHA, сообщение, файлы, SHA родителей) сводного графа.
+
+    Линейные участки — коммиты с единственным родителем, у которого единственный потомок, —
+    сворачиваются в один узел-диапазон, если в участке не меньше min_run коммитов (None —
+    не сворачивать, только ограничить граф). Узел получает SHA самого нового коммита
+    участка (на него ссылаются потомки) и родителей самого старого, поэтому размер вывода
+    пропорционален числу ветвлений и слияний. max_depth и
+    first_parent ограничивают граф глубиной от вершин tips и первыми родителями, как
+    `git log --first-parent`. with_files=False — граф без списков файлов (как в temp.py).
+    """
+    count = len(dag)
+    selected = select_rows(dag, tips, max_depth, first_parent)
+
+    # Число потомков каждой строки внутри сводного графа
+    children = array('I', [0]) * count
+    for row in range(count):
+        if selected is None or selected[row]:
+            for parent in _parent_rows(dag, row, first_parent, selected):
+                children[parent] += 1
+
+    # Строка поглощается участком своего единственного потомка
+    absorbed = bytearray(count)
+    for row in range(count if min_run is not None else 0):
+        if selected is None or selected[row]:
+            parents = _parent_rows(dag, row, first_parent, selected)
+            if len(parents) == 1 and children[parents[0]] == 1:
+                absorbed[parents[0]] = 1
+
+    for row in range(count):
+        if absorbed[row] or (selected is not None and not selected[row]):
+            continue
+        members = [row]  # участок от нового коммита к старому
+        parents = _parent_rows(dag, row, first_parent, selected)
+        while len(parents) == 1 and absorbed[parents[0]]:
+            members.append(parents[0])
+            parents = _parent_rows(dag, parents[0], first_parent, selected)
+
+        if min_run is not None and len(members) >= min_run:
+            newest = dag.sha(dag.row_ids[members[0]])
+            oldest = dag.sha(dag.row_ids[members[-1]])
+            message = f"{len(members)} commits: {node_id(oldest)}..{node_id(newest)}"
+            yield newest, message, None, [dag.sha(dag.row_ids[parent]) for parent in parents]
+            continue
+        for member in members:
+            commit_hash, message, changed_files, _ = dag.record(member)
+            if not with_files:
+                changed_files = None
+            member_parents = _parent_rows(dag, member, first_parent, selected)
+            yield commit_hash, message, changed_files, [dag.sha(dag.row_ids[parent]) for parent in member_parents]
+
+
+# Функция чтения настроек сводного графа из секции config.ini
+def summary_settings(settings):
+    """Возвращает параметры collapse_chains по ключам collapse_chains, max_depth и first_parent."""
+    max_depth = settings.get('max_depth', fallback=None)
+    return {
+        'min_run': 2 if settings.getboolean('collapse_chains', fallback=False) else None,
+        'max_depth': int(max_depth) if max_depth else None,
+        'first_parent': settings.getboolean('first_parent', fallback=False),
+    }
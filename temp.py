@@ -1,6 +1,16 @@
+import sys
+import argparse
+import contextlib
 import subprocess
 import configparser
 
+import stats
+from emitters import EMITTERS, write_lines
+from gitstore import ObjectStore
+from history_cache import open_history_cache
+from dag import CommitDag
+from summarize import collapse_chains, filter_commits, summary_settings
+
 
 # Функция чтения конфигурационного файла
 def load_config(config_path):
@@ -21,39 +31,138 @@ def get_files_from_commit(commit, repo_path):
     return result.stdout.splitlines()
 
 
+# Функция разбора одной записи потока git log: SHA, сообщение, файлы, родители
+def parse_log_record(record):
+    fields = record.split(b'\0')
+    header, commit_message = fields[0].decode('utf-8', errors='replace').split('\x1f', 1)
+    commit_hash, *parents = header.split()
+    files = [name.lstrip(b'\n').decode('utf-8', errors='replace') for name in fields[1:]]
+    return commit_hash, commit_message.strip(), [name for name in files if name], parents
+
+
+# Функция потокового чтения истории одним процессом git log (вместо двух процессов на коммит).
+# paths ограничивают историю файлами и каталогами, как `git log --full-history -- path`: без переписывания
+# родителей git отбирает коммиты, отличающиеся по путям хотя бы от одного настоящего родителя, -m и
+# log.showRoot выводят файлы слияний и корневого коммита, а отбор идёт по фильтрам Блума commit-graph git,
+# если они есть. Родители записей при этом настоящие, а слияние может встретиться по разу на каждого родителя
+def iter_git_log(repo_path, revisions=('--all',), paths=()):
+    command = ['git', '-c', f'log.showRoot={"true" if paths else "false"}', '-c', 'core.quotePath=false', 'log', *revisions,
+               '--no-renames', '--name-only', '-z', '--format=%x1e%H %P%x1f%s']
+    if paths:
+        command[-1:-1] = ['--full-history', '-m']
+        command += ['--', *paths]
+    process = subprocess.Popen(command, cwd=repo_path, stdout=subprocess.PIPE)
+    try:
+        tail = b''
+        # Разбираем вывод по мере поступления, в памяти держим только незавершённую запись
+        for chunk in iter(lambda: process.stdout.read1(1 << 16), b''):
+            records = (tail + chunk).split(b'\x1e')
+            tail = records.pop()
+            for record in records:
+                if record:
+                    yield parse_log_record(record)
+        if tail:
+            yield parse_log_record(tail)
+    finally:
+        if process.poll() is None:  # обход прерван раньше конца истории
+            process.kill()
+        process.stdout.close()
+        process.wait()
+
+
+# Функция получения истории, ограниченной путями, с тем же отбором коммитов, что у GitParser и
+# GitDependencyGraph.filter_paths: коммит остаётся, если отличается по путям хотя бы от одного родителя
+def iter_path_records(repo_path, paths, revisions=('--all',)):
+    changed = {}  # SHA отобранного коммита -> (сообщение, изменённые файлы)
+    for commit_hash, commit_message, files, _ in iter_git_log(repo_path, revisions, paths):
+        changed_files = changed.setdefault(commit_hash, (commit_message, []))[1]
+        changed_files.extend(name for name in files if name not in changed_files)
+
+    # Родителей переписываем сами по полному графу, как filter_paths: переписывание git (--parents)
+    # убирает родителей раньше сравнения, и слияние, внёсшее путь с ветки, где его не было, теряется
+    dag = CommitDag()
+    result = subprocess.run(['git', 'rev-list', '--parents', *revisions], cwd=repo_path, capture_output=True, text=True)
+    for line in result.stdout.splitlines():
+        commit_hash, *parents = line.split()
+        dag.add_commit(commit_hash, None, parents)
+    for commit_hash, _, _, parents in filter_commits(dag, lambda row: dag.sha(dag.row_ids[row]) in changed):
+        commit_message, changed_files = changed[commit_hash]
+        yield commit_hash, commit_message, changed_files, parents
+
+
 # Функция построения кода графа
 def build_mermaid_graph(repo_path):
-    commits = get_git_commits(repo_path)
     graph = ["graph TD"]    # код графа
     seen_commits = set()    # просмотреные коммиты
 
-    for commit in commits:
-        commit_hash, commit_message = commit.split(' ', 1)
-
-        # Пропускаем уже добавленные коммиты
-        if commit_hash in seen_commits: 
-            continue
-        
+    for commit_hash, commit_message, files, parent_commits in iter_git_log(repo_path):
         seen_commits.add(commit_hash) 
-        files = get_files_from_commit(commit, repo_path)
         files_list = ', '.join(files) if files else "No files"
-        graph.append(f"    {commit_hash}({commit_message.strip()}: {files_list})")
+        graph.append(f"    {commit_hash}({commit_message}: {files_list})")
 
-        # Получаем родительские коммиты
-        parent_result = subprocess.run(['git', 'rev-list', '--parents', '-n', '1', commit_hash], cwd=repo_path, capture_output=True, text=True)
-        parent_commits = parent_result.stdout.split()
-        
-        for parent in parent_commits[1:]:
+        for parent in parent_commits:
             if parent not in seen_commits:
                 graph.append(f"    {parent} --> {commit_hash}")
 
     return graph
 
 
-# Функция сохранения кода графа в файл
-def save_graph_to_file(graph, output_file):
+# Функция получения вершин всех ссылок (аннотированные теги раскрываются до коммитов) и HEAD
+def get_ref_tips(repo_path):
+    result = subprocess.run(['git', 'for-each-ref', '--format=%(refname) %(objectname) %(*objectname)'], cwd=repo_path, capture_output=True, text=True)
+    tips = {}
+    for line in result.stdout.splitlines():
+        refname, objectname, *peeled = line.split()
+        tips[refname] = peeled[0] if peeled else objectname
+    head = subprocess.run(['git', 'rev-parse', '--verify', '-q', 'HEAD'], cwd=repo_path, capture_output=True, text=True)
+    if head.stdout.strip():
+        tips['HEAD'] = head.stdout.strip()
+    return tips
+
+
+# Функция получения записей коммитов (SHA, сообщение, файлы, родители) по одной
+def iter_commit_records(repo_path, cache=None):
+    if cache is None:
+        yield from stats.iterate('git_log', iter_git_log(repo_path))
+        return
+
+    # git log обходит только коммиты, появившиеся после прошлого запуска
+    with stats.phase('refs'):
+        tips = get_ref_tips(repo_path)
+    store = ObjectStore(repo_path)
+    known_tips = sorted({sha for sha in cache.tips.values() if sha in cache.commits and store.has_object(sha)})
+    store.close()
+    revisions = ('--all', '--not', *known_tips) if known_tips else ('--all',)
+    new_commits = set()
+    to_visit = list(tips.values())
+    for commit_hash, commit_message, files, parents in stats.iterate('git_log', iter_git_log(repo_path, revisions)):
+        if stats.active is not None:
+            stats.active.count('history_cache.miss')
+        cache.add(commit_hash, None, parents, commit_message, files)
+        new_commits.add(commit_hash)
+        to_visit.extend(parents)
+        yield commit_hash, commit_message, files, parents
+
+    # Остальные коммиты, достижимые из текущих ссылок, берём из кэша
+    reachable = set()
+    while to_visit:
+        commit_hash = to_visit.pop()
+        if commit_hash in reachable or commit_hash in new_commits or commit_hash not in cache.commits:
+            continue
+        reachable.add(commit_hash)
+        to_visit.extend(cache.commits[commit_hash][1])
+    stats.count('history_cache.hit', len(reachable))
+    yield from cache.iter_records(reachable)
+    with stats.phase('cache_save'):
+        cache.save(tips)
+
+
+# Функция сохранения кода графа в файл (строкой или потоком строк)
+def save_graph_to_file(graph, output_file, *echo):
+    if isinstance(graph, str):
+        graph = [graph]
     with open(output_file, 'w') as f:
-        f.write(graph)
+        write_lines(graph, f, *echo)
 
 
 def main():
@@ -62,19 +171,43 @@ def main():
     repo_path = config['repository_path']               # Путь к анализируемому репозиторию
     output_file = config['output_file']                 # Путь к файлу-результату в виде кода
 
-    # Строим и записываем код графа
-    graph = build_mermaid_graph(repo_path)
-    graph.pop(1)
-    graph = "\n".join(graph)
-    save_graph_to_file(graph, output_file)
+    output_format = config.get('output_format', fallback='mermaid')  # mermaid, dot или jsonl
+    summary = summary_settings(config)
+    paths = config.get('paths', fallback='').split()  # только коммиты, изменившие эти файлы и каталоги
+
+    # Строим и записываем код графа по мере обхода истории
+    dag = CommitDag()
+    if paths:  # кэш хранит полные списки файлов, отбор по путям делает сам git
+        commit_records = stats.iterate('git_log', iter_path_records(repo_path, paths))
+    else:
+        with stats.phase('cache_load'):
+            cache = open_history_cache(config, repo_path, 'git-log', ObjectStore(repo_path).has_object)
+        commit_records = iter_commit_records(repo_path, cache)
+    records = stats.iterate('dag', dag.add_records(commit_records))
+    if summary['min_run'] is not None or summary['max_depth'] is not None or summary['first_parent']:
+        # Сводный граф строится по всей истории, поэтому сначала дочитываем её целиком
+        for _ in records:
+            pass
+        records = stats.iterate('summarize', collapse_chains(dag, **summary))
+    with stats.phase('output'):
+        save_graph_to_file(stats.iterate('emit', EMITTERS[output_format](records)), output_file, sys.stdout)
 
-    print(graph)
     print(f"Путь к программе для визуализации: {visualization_path}")
 
 
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser()
+    stats.add_arguments(parser)
+    # Одна сессия статистики на оба генератора файла: её закрывает второй генератор в конце файла,
+    # иначе отчёт --stats второго генератора перезаписал бы отчёт первого
+    script_session = contextlib.ExitStack()
+    script_session.enter_context(stats.session_from_args(parser.parse_args()))
+    try:
+        main()
+    except BaseException:
+        script_session.close()  # отчёт записывается и при ошибке
+        raise
 
 
 #--------------#--------------#--------------#--------------#--------------#--------------#--------------#--------------
@@ -86,10 +219,25 @@ import os
 import zlib
 import configparser
 
+import stats
+from gitstore import ObjectStore
+from commitgraph import CommitGraph
+from emitters import EMITTERS, node_id, write_lines
+from dag import CommitDag
+from refs import RefStore
+from revwalk import walk_range
+from trees import parse_tree
+from pathfilter import PathFilter
+from bloom import ChangedPathIndex
+from summarize import collapse_chains, filter_commits, summary_settings
+
 class GitDependencyGraph:
     def __init__(self, repo_path):
         self.repo_path = repo_path
-        self.dependencies = {}
+        self.dag = CommitDag()  # компактный граф: коммит -> родители
+        self.store = None
+        self.commit_graph = CommitGraph.open(repo_path) if os.path.isdir(os.path.join(repo_path, ".git")) else None
+        self.path_entries = {}  # (SHA дерева, путь) -> SHA записи по этому пути
 
 
     def get_git_dir(self):
@@ -101,22 +249,19 @@ class GitDependencyGraph:
 
 
     def read_object(self, sha):
-        """Читает объект Git из .git/objects."""
-        git_dir = self.get_git_dir()
-        obj_dir = os.path.join(git_dir, "objects", sha[:2])  # Первые два символа — подпапка
-        obj_path = os.path.join(obj_dir, sha[2:])  # Остальная часть — имя файла
-        if not os.path.isfile(obj_path):
-            print(f"Пропущен отсутствующий объект {sha}. Возможно, репозиторий повреждён.")
-            return None
+        """Читает объект Git из .git/objects (loose-объект или pack-файл)."""
+        if self.store is None:
+            self.get_git_dir()
+            self.store = ObjectStore(self.repo_path)
         try:
-            with open(obj_path, "rb") as f:
-                compressed_data = f.read()
-                data = zlib.decompress(compressed_data)
-                print(data)
-            return data
-        except zlib.error as e:
+            obj_type, content = self.store.read(sha)
+        except (zlib.error, ValueError) as e:
             print(f"Ошибка при декомпрессии объекта {sha}: {e}")
             return None
+        if obj_type is None:
+            print(f"Пропущен отсутствующий объект {sha}. Возможно, репозиторий повреждён.")
+            return None
+        return f"{obj_type} {len(content)}".encode() + b"\0" + content
 
     def parse_commit(self, data):
         """Парсит содержимое объекта коммита."""
@@ -150,75 +295,236 @@ class GitDependencyGraph:
             print("Файл HEAD отсутствует. Репозиторий повреждён.")
             return False
 
+        # HEAD должен указывать на коммит с читаемым корневым деревом
+        if self.store is None:
+            self.store = ObjectStore(self.repo_path)
+        try:
+            head = RefStore(self.repo_path, self.store).select_tips(["HEAD"]).get("HEAD")
+        except KeyError:
+            head = None
+        data = self.read_object(head) if head else None
+        if data is None:
+            print("В репозитории нет коммитов.")
+            return False
+        tree = data.split(b"\0", 1)[1].split(b"\n", 1)[0].split()[1].decode()  # строка "tree <sha>"
+        if self.read_tree(tree) is None:
+            print(f"Корневое дерево {tree} коммита HEAD повреждено.")
+            return False
+
         return True
 
 
-    def collect_dependencies(self):
-        """Собирает зависимости коммитов, обходя историю из HEAD."""
-        git_dir = self.get_git_dir()
-        head_path = os.path.join(git_dir, "HEAD")
-        if not os.path.isfile(head_path):
-            raise FileNotFoundError("Файл HEAD не найден. Репозиторий повреждён?")
+    def read_tree(self, sha):
+        """Возвращает записи объекта-дерева (имя в байтах, SHA в 20 байтах, является ли деревом) или None."""
+        if self.store is None:
+            self.get_git_dir()
+            self.store = ObjectStore(self.repo_path)
+        try:
+            obj_type, content = self.store.read(sha)
+        except (zlib.error, ValueError) as e:
+            print(f"Ошибка при декомпрессии дерева {sha}: {e}")
+            return None
+        if obj_type != "tree":
+            return None
+        try:
+            return parse_tree(content)
+        except ValueError as e:
+            print(f"Ошибка при разборе дерева {sha}: {e}")
+            return None
 
-        # Получаем текущую ссылку (ref) или SHA коммита
-        with open(head_path, "r") as f:
-            ref = f.readline().strip()
-        if ref.startswith("ref:"):
-            ref_path = os.path.join(git_dir, ref[5:])
-            with open(ref_path, "r") as f:
-                current_commit = f.readline().strip()
-        else:
-            current_commit = ref  # Если в HEAD уже прямой SHA
 
-        # Рекурсивно обходим историю коммитов
-        to_visit = [current_commit]
-        visited = set()
+    def read_parents(self, sha):
+        """Возвращает (SHA родителей, номер поколения): из commit-graph, иначе из объекта коммита."""
+        record = self.commit_graph.get(sha) if self.commit_graph else None
+        if stats.active is not None:
+            stats.active.count('commit_graph.hit' if record is not None else 'commit_graph.miss')
+        if record is not None:
+            return record[1], record[2]
+        data = self.read_object(sha)
+        if data is None:
+            return None, None
+        return self.parse_commit(data), None
+
+
+    def read_commit_meta(self, sha):
+        """Возвращает (SHA родителей, время коммита, номер поколения или None) для ленивого обхода."""
+        record = self.commit_graph.get(sha) if self.commit_graph else None
+        if stats.active is not None:
+            stats.active.count('commit_graph.hit' if record is not None else 'commit_graph.miss')
+        if record is not None:
+            return record[1], record[3], record[2]
+        data = self.read_object(sha)
+        if data is None:
+            return None
+        commit_time = 0
+        for line in data.split(b"\0", 1)[1].split(b"\n"):
+            if line.startswith(b"committer "):
+                commit_time = int(line.rsplit(b" ", 2)[1])  # "... <email> 1700000000 +0300"
+            elif line == b"":
+                break
+        return self.parse_commit(data), commit_time, None
+
+
+    def read_commit_tree(self, sha):
+        """Возвращает SHA корневого дерева коммита: из commit-graph, иначе из объекта коммита."""
+        record = self.commit_graph.get(sha) if self.commit_graph else None
+        if record is not None:
+            return record[0]
+        data = self.read_object(sha)
+        if data is None:
+            return None
+        return data.split(b"\0", 1)[1].split(b"\n", 1)[0].split()[1].decode()  # строка "tree <sha>"
+
+
+    def path_entry(self, tree_sha, components):
+        """Возвращает SHA записи (файла или поддерева) по пути components внутри дерева или None.
+
+        Читаются только деревья на этом пути; результат запоминается для каждого поддерева,
+        поэтому у коммитов с общими поддеревьями они не читаются повторно.
+        """
+        if not components:
+            return tree_sha
+        key = (tree_sha, components)
+        if key not in self.path_entries:
+            child = next((sha.hex() for name, sha, _ in self.read_tree(tree_sha) or () if name == components[0]), None)
+            self.path_entries[key] = self.path_entry(child, components[1:]) if child else None
+        return self.path_entries[key]
+
+
+    def filter_paths(self, paths, path_index=None):
+        """Оставляет в графе только коммиты, изменившие файлы или каталоги paths (как `git log -- path`).
+
+        Коммит изменил путь, если запись по этому пути отличается от записи хотя бы у одного
+        родителя (у корневого коммита — если она есть). Родителями оставшихся коммитов
+        становятся ближайшие оставшиеся предки. path_index (ChangedPathIndex, его строит
+        visualizer.py) позволяет отбросить коммиты, точно не менявшие пути, не читая деревьев.
+        """
+        path_filter = PathFilter(paths)
+        if path_filter.bloom_hashes is None:
+            return  # путь "." — весь репозиторий
+        specs = [tuple(spec.split(b"/")) for spec in path_filter.paths]
+        entries = {}  # SHA коммита -> записи по путям
+
+        def commit_entries(sha):
+            if sha not in entries:
+                tree = self.read_commit_tree(sha)
+                entries[sha] = tuple(self.path_entry(tree, spec) for spec in specs) if tree else None
+            return entries[sha]
+
+        def touches(row):
+            sha = self.dag.sha(self.dag.row_ids[row])
+            parents = self.read_parents(sha)[0] or []  # все родители, включая не попавших в граф
+            if parents and path_index is not None and path_index.might_touch(sha, path_filter.bloom_hashes) is False:
+                return False
+            own = commit_entries(sha)
+            if own is None:
+                return False
+            if not parents:
+                return any(own)
+            return any(commit_entries(parent) != own for parent in parents)
+
+        with stats.phase('path_filter'):
+            dag = CommitDag()
+            for _ in dag.add_records(filter_commits(self.dag, touches)):
+                pass
+        self.dag = dag
+        return len(self.dag) > 0
+
+
+    def collect_dependencies(self, min_generation=None, refs=None, exclude=None, max_count=None, since=None, until=None):
+        """Собирает зависимости коммитов, обходя историю из выбранных ссылок (по умолчанию всех ссылок и HEAD).
+
+        Все вершины обходятся за один проход с общим множеством посещённых коммитов.
+        Коммиты с номером поколения меньше min_generation (по commit-graph) в обход не попадают.
+        Если заданы exclude (коммиты, достижимые из этих ссылок, отбрасываются), max_count,
+        since или until, история обходится лениво от новых коммитов к старым (см. revwalk.walk_range).
+        """
+        git_dir = self.get_git_dir()
+        if not os.path.isfile(os.path.join(git_dir, "HEAD")):
+            raise FileNotFoundError("Файл HEAD не найден. Репозиторий повреждён?")
+        if self.store is None:
+            self.store = ObjectStore(self.repo_path)
+
+        # Вершины: loose-ссылки, packed-refs и HEAD, аннотированные теги раскрыты до коммитов
+        ref_store = RefStore(self.repo_path, self.store)
+        with stats.phase('refs'):
+            tips = ref_store.select_tips(refs)
+
+        if exclude or max_count is not None or since is not None or until is not None:
+            parents_of = {}  # родители прочитанных коммитов, чтобы не читать их повторно
+
+            def read_commit(sha):
+                record = self.read_commit_meta(sha)
+                if record is None or (min_generation is not None and record[2] is not None and record[2] < min_generation):
+                    return None
+                parents_of[sha] = record[0]
+                return record
+
+            excluded = ref_store.select_tips(exclude).values() if exclude else ()
+            walk = stats.iterate('walk', walk_range(list(dict.fromkeys(tips.values())), list(excluded), read_commit, max_count, since, until))
+            selected = {sha: parents_of[sha] for sha in walk}
+            # Рёбра оставляем только между выбранными коммитами
+            for sha, parents in selected.items():
+                self.dag.add_commit(sha, None, [parent for parent in parents if parent in selected])
+            return len(self.dag) > 0
+
+        # Обходим историю коммитов явным стеком
+        collector = stats.active
+        if collector is not None:
+            collector.enter('walk')
+        to_visit = list(dict.fromkeys(tips.values()))
+        skipped = set()  # отсутствующие и отсечённые коммиты; посещённые хранит сам граф
 
         while to_visit:
             sha = to_visit.pop()
-            if sha in visited:
+            if sha in self.dag or sha in skipped:
                 continue
-            visited.add(sha)
 
             try:
-                data = self.read_object(sha)
-                if data is None:
+                parents, generation = self.read_parents(sha)
+                if parents is None:
+                    skipped.add(sha)
+                    continue
+                if min_generation is not None and generation is not None and generation < min_generation:
+                    skipped.add(sha)
                     continue
-                parents = self.parse_commit(data)
-                self.dependencies[sha] = parents
+                self.dag.add_commit(sha, None, parents)
                 to_visit.extend(parents)  # Добавляем родителей для дальнейшего обхода
             except Exception as e:
                 print(f"Ошибка при обработке коммита {sha}: {e}")
 
-        return bool(self.dependencies)
+        if collector is not None:
+            collector.exit('walk')
+        return len(self.dag) > 0
 
 
-    def build_graph(self):
-        """Создаёт граф зависимости в формате Mermaid и выводит в консоль."""
-        print("Создание графа зависимостей...")
-        mermaid_output = "graph TD;\n"
-
-        # Добавляем узлы и связи в граф
-        for commit, parents in self.dependencies.items():
-            commit_node = commit[:7]  # Для краткости отображаем только первые 7 символов SHA
-            mermaid_output += f"    {commit_node}({commit_node})\n"
-            for parent in parents:
-                parent_node = parent[:7]
-                mermaid_output += f"    {commit_node} --> {parent_node}\n"
+    def build_graph(self, output=None, output_format="mermaid", min_run=None, max_depth=None, first_parent=False):
+        """Создаёт граф зависимости (mermaid, dot или jsonl) и выводит его построчно (по умолчанию в консоль).
 
-        # Выводим результат в консоль
-        print(mermaid_output)
+        min_run, max_depth и first_parent задают сводный граф (см. summarize.collapse_chains).
+        """
+        print("Создание графа зависимостей...")
+        if min_run is None and max_depth is None and not first_parent:
+            records = ((commit, node_id(commit), None, [parent for parent in parents if parent in self.dag])
+                       for commit, _, _, parents in self.dag.iter_records())
+        else:
+            records = ((commit, message or node_id(commit), None, parents)
+                       for commit, message, _, parents in collapse_chains(self.dag, None, max_depth, first_parent, min_run, with_files=False))
+        write_lines(stats.iterate('emit', EMITTERS[output_format](records)), output or sys.stdout)
 
 
-    def generate_dependency_graph(self):
-        """Главная функция для генерации графа зависимостей."""
+    def generate_dependency_graph(self, output_format="mermaid", paths=(), **summary):
+        """Главная функция для генерации графа зависимостей (paths — только коммиты, изменившие эти пути)."""
         if not self.check_repository_integrity():
             print("Репозиторий некорректен или повреждён.")
             return
 
-        if self.collect_dependencies():
+        if self.collect_dependencies() and paths:
+            path_index = ChangedPathIndex(ChangedPathIndex.default_path(self.repo_path))
+            self.filter_paths(paths, path_index if path_index.load() else None)
+        if len(self.dag) > 0:
             print("Зависимости успешно собраны. Создаём граф...")
-            self.build_graph()
+            self.build_graph(output_format=output_format, **summary)
         else:
             print("Не удалось создать граф зависимостей.")
 
@@ -228,12 +534,15 @@ def main():
     config.read('config.ini')
 
     repo_path = config.get('Settings', 'repository_path')
+    output_format = config.get('Settings', 'output_format', fallback='mermaid')
+    paths = config.get('Settings', 'paths', fallback='').split()
 
     graph = GitDependencyGraph(repo_path)
-    graph.generate_dependency_graph()
+    graph.generate_dependency_graph(output_format, paths, **summary_settings(config['Settings']))
 
 if __name__ == "__main__":
-    main()
+    with script_session:  # сессия статистики, открытая первым генератором в начале файла
+        main()
 
 
 
@@ -0,0 +1,494 @@
+import io
+import os
+import sys
+import subprocess
+import tempfile
+
+import json
+import shutil
+import configparser
+import contextlib
+import threading
+import urllib.request
+
+import temp
+import stats
+import benchmarks
+import visualizer
+import daemon
+import batch
+import churn
+from emitters import mermaid_lines, dot_lines, jsonl_lines
+from summarize import collapse_chains
+from history_cache import HistoryCache
+from commitgraph import CommitGraph
+from dag import CommitDag
+from gitstore import ObjectStore
+from trees import parse_tree
+from pathfilter import PathFilter, SKIP, PARTIAL, INSIDE
+from bloom import ChangedPathIndex, make_filter, filter_contains, key_hashes
+
+
+# Функция запуска git в тестовом репозитории
+def git(repo_path, *args):
+    result = subprocess.run(['git', *args], cwd=repo_path, capture_output=True, text=True, check=True)
+    return result.stdout
+
+
+# Функция создания тестового репозитория, повторяющего историю из tests.py
+def make_repo(repo_path):
+    git(repo_path, 'init', '-q', '-b', 'master')
+    git(repo_path, 'config', 'user.email', 'test@example.com')
+    git(repo_path, 'config', 'user.name', 'test')
+
+    def write(name, text):
+        path = os.path.join(repo_path, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'a') as f:
+            f.write(text)
+
+    def commit(message):
+        git(repo_path, 'add', '-A')
+        git(repo_path, 'commit', '-q', '-m', message)
+
+    write('1.txt', '1\n'); write('2.txt', '2\n'); write('folder1/3.txt', '3\n'); write('folder2/4.txt', '4\n')
+    commit('Initial commit')
+    write('1.txt', '11\n'); commit('update 1.txt')
+    write('folder3/5.txt', '5\n'); commit('add folder3 and 5.txt')
+    write('folder2/4.txt', '44\n'); commit('update 4.txt')
+    git(repo_path, 'checkout', '-q', '-b', 'feature-branch')
+    write('2.txt', '22\n'); commit('Update file2.txt in feature-branch')
+    git(repo_path, 'checkout', '-q', 'master')
+    write('1.txt', '111\n'); commit('Update file1.txt in main branch')
+    git(repo_path, 'merge', '-q', '--no-ff', 'feature-branch', '-m', 'Merge feature-branch into main')
+
+
+loose_path = tempfile.mkdtemp()
+packed_path = tempfile.mkdtemp()
+make_repo(loose_path)
+git(loose_path, 'tag', '-a', 'v1', '-m', 'v1', 'master~1')
+git(packed_path, 'clone', '-q', '--bare', loose_path, os.path.join(packed_path, '.git'))
+git(packed_path, 'config', 'core.bare', 'false')
+git(packed_path, 'repack', '-a', '-d', '-q')
+assert not [name for name in os.listdir(os.path.join(packed_path, '.git', 'objects')) if len(name) == 2]
+
+
+#ObjectStore
+outputs = []
+store = ObjectStore(packed_path)
+for line in git(packed_path, 'cat-file', '--batch-all-objects', '--batch-check').splitlines():
+    sha, obj_type, size = line.split()
+    outputs.append(store.read(sha)[0] == obj_type and len(store.read(sha)[1]) == int(size))
+assert outputs and all(outputs)
+assert store.read('0' * 40) == (None, None)
+
+
+#get_commit_info (pack)
+head = git(loose_path, 'rev-parse', 'master').strip()
+loose_commit = visualizer.GitParser(loose_path).get_commit_info(head)
+packed_commit = visualizer.GitParser(packed_path).get_commit_info(head)
+assert loose_commit['name'] == packed_commit['name'] == 'Merge feature-branch into main'
+assert sorted(loose_commit['changed_files']) == sorted(packed_commit['changed_files'])
+
+
+#walk_commits
+outputs = visualizer.GitParser(loose_path).walk_commits([head])
+assert len(outputs) == 7
+assert list(outputs)[0] == git(loose_path, 'rev-list', '--max-parents=0', 'master').strip()
+assert [commit['name'] for commit in outputs[head]['parents']] == ['Update file1.txt in main branch', 'Update file2.txt in feature-branch']
+assert outputs[head]['parents'][0]['changed_files'] == ['1.txt']
+outputs = list(visualizer.GitParser(loose_path).iter_commits([head]))  # обход отдаёт SHA родителей, а не их узлы
+assert [commit_info['sha'] for commit_info in outputs] == list(visualizer.GitParser(loose_path).walk_commits([head]))
+assert outputs[-1]['parents'] == outputs[-1]['parent_hashes'] == git(loose_path, 'rev-parse', 'master^1', 'master^2').split()
+
+
+#mermaid_lines
+outputs = list(mermaid_lines([('a' * 40, 'update "1.txt"', ['1.txt'], []), ('b' * 40, 'update "1.txt"', [], ['a' * 40])]))
+assert outputs == ['graph TD;\n', '    aaaaaaaaaaaa("update #quot;1.txt#quot;<br>Changed files: 1.txt")\n',
+    '    bbbbbbbbbbbb("update #quot;1.txt#quot;<br>Changed files: No changes")\n', '    aaaaaaaaaaaa --> bbbbbbbbbbbb\n']
+
+
+#iter_git_log
+outputs = list(temp.iter_git_log(loose_path))
+assert len(outputs) == 7
+assert outputs[-1] == (git(loose_path, 'rev-list', '--max-parents=0', 'master').strip(), 'Initial commit', [], [])
+assert ('Update file2.txt in feature-branch', ['2.txt']) in [(message, files) for _, message, files, _ in outputs]
+assert [len(parents) for commit_hash, _, _, parents in outputs if commit_hash == head] == [2]
+assert f'    {head}(Merge feature-branch into main: No files)' in temp.build_mermaid_graph(loose_path)
+
+
+#write_mermaid (--jobs)
+outputs = []
+for jobs in (1, 3):
+    output = io.StringIO()
+    visualizer.GitParser(packed_path).write_mermaid([head], output, jobs=jobs)
+    outputs.append(output.getvalue())
+assert outputs[0] == outputs[1] and outputs[0].count('-->') == 7
+
+
+#HistoryCache
+outputs = []
+cache_path = os.path.join(tempfile.mkdtemp(), 'cache.jsonl')
+for run in range(2):
+    cache = HistoryCache(cache_path, 'visualizer')
+    outputs.append(cache.load())
+    output = io.StringIO()
+    visualizer.GitParser(loose_path, history_cache=cache).write_mermaid([head], output)
+    outputs.append(output.getvalue())
+    cache.save({'refs/heads/master': head})
+assert outputs[0] is False and outputs[2] is True and outputs[1] == outputs[3]
+with open(cache_path, 'r+b') as f:
+    f.seek(200)
+    f.write(b'#')
+assert HistoryCache(cache_path, 'visualizer').load() is False
+assert HistoryCache(cache_path, 'git-log').load() is False
+
+cache = HistoryCache(os.path.join(tempfile.mkdtemp(), 'cache.jsonl'), 'git-log')
+outputs = sorted(temp.iter_commit_records(loose_path, cache))
+assert outputs == sorted(temp.iter_commit_records(loose_path, cache)) == sorted(temp.iter_git_log(loose_path))
+assert len(cache.commits) == 7 and cache.tips['refs/heads/master'] == head
+
+
+#CommitGraph
+graph_path = tempfile.mkdtemp()
+git(graph_path, 'clone', '-q', '--bare', loose_path, os.path.join(graph_path, '.git'))
+git(graph_path, 'config', 'core.bare', 'false')
+git(graph_path, 'commit-graph', 'write', '--reachable')
+graph = CommitGraph.open(graph_path)
+for line in git(graph_path, 'log', '--all', '--format=%H %T %P').splitlines():
+    commit_hash, tree_hash, *parents = line.split()
+    assert graph.get(commit_hash)[:2] == (tree_hash, parents)
+    assert all(graph.generation(parent) < graph.generation(commit_hash) for parent in parents)
+assert graph.get('0' * 40) is None and CommitGraph.open(loose_path) is None
+broken_path = tempfile.mkdtemp()
+shutil.copytree(os.path.join(graph_path, '.git'), os.path.join(broken_path, '.git'))
+with open(os.path.join(broken_path, '.git', 'objects', 'info', 'commit-graph'), 'r+b') as f:
+    f.truncate(16)
+output, errors = io.StringIO(), io.StringIO()
+with contextlib.redirect_stdout(output), contextlib.redirect_stderr(errors):
+    assert CommitGraph.open(broken_path) is None
+assert output.getvalue() == '' and 'commit-graph' in errors.getvalue()  # stdout занят выводом графа
+
+outputs = []
+for use_graph in (True, False):
+    parser = visualizer.GitParser(graph_path)
+    if not use_graph:
+        parser.commit_graph = None
+    output = io.StringIO()
+    parser.write_mermaid([head], output)
+    outputs.append(output.getvalue())
+assert outputs[0] == outputs[1]
+assert len(visualizer.GitParser(graph_path).walk_commits([head], min_generation=graph.generation(head) - 1)) == 3
+
+
+#CommitDag
+dag = visualizer.GitParser(loose_path).build_dag([head])
+assert len(dag) == 7 and head in dag and '0' * 40 not in dag
+outputs = {record[0]: record for record in dag.iter_records()}
+assert outputs[head][1] == 'Merge feature-branch into main' and len(outputs[head][3]) == 2
+assert len(dag.paths) == len(set(dag.paths)) and len(dag.parent_ids) == 7
+assert list(CommitDag().add_records(temp.iter_git_log(loose_path))) == list(temp.iter_git_log(loose_path))
+
+
+#RefStore
+parser = visualizer.GitParser(packed_path)
+assert not os.path.exists(os.path.join(packed_path, '.git', 'refs', 'heads', 'master'))
+outputs = parser.get_tip_hashes()
+assert outputs['HEAD'] == outputs['refs/heads/master'] == head
+assert outputs['refs/tags/v1'] == git(loose_path, 'rev-parse', 'v1^{commit}').strip()
+assert parser.get_tip_hashes(['feature-branch', 'v1']) == {'refs/heads/feature-branch': outputs['refs/heads/feature-branch'], 'refs/tags/v1': outputs['refs/tags/v1']}
+git(loose_path, 'checkout', '-q', '--detach', 'master~1')
+assert visualizer.GitParser(loose_path).get_head_hash() == outputs['refs/tags/v1']
+git(loose_path, 'checkout', '-q', 'master')
+cwd = os.getcwd()
+assert parser.get_commit_history()['sha'] == head and os.getcwd() == cwd
+assert parser.get_tip_hashes(['master~1', 'HEAD^2']) == {'refs/heads/master~1': outputs['refs/tags/v1'], 'HEAD^2': git(loose_path, 'rev-parse', 'master^2').strip()}
+
+
+#walk_range
+def rev_list(repo_path, *args):
+    return git(repo_path, 'rev-list', *args).split()
+
+for repo_path in (loose_path, graph_path):
+    parser = visualizer.GitParser(repo_path)
+    since = git(repo_path, 'log', '-1', '--format=%ct', 'master~1').strip()
+    for revisions, options, args in ((['master~2..master'], {}, ['master~2..master']),
+                                     (['master', '^v1'], {}, ['master', '^v1']),
+                                     (['master'], {'max_count': 1}, ['-n', '1', 'master']),
+                                     (['master'], {'since': since}, ['--since', since, 'master']),
+                                     (['master'], {'until': since}, ['--until', since, 'master'])):
+        selected = parser.select_revisions(revisions, **options)
+        assert sorted(selected) == sorted(rev_list(repo_path, *args)), (repo_path, revisions, options)
+    output = io.StringIO()
+    selected = parser.select_revisions(['master~1..master'])
+    parser.write_mermaid(list(selected), output, selected=selected)
+    assert output.getvalue().count('-->') == 1 and 'Merge feature-branch into main' in output.getvalue()
+    selected = parser.select_revisions(['master~2..master'])
+    for options, args in (({'first_parent': True}, ['--first-parent', 'master~2..master']),
+                          ({'max_depth': 1}, ['-n', '1', 'master']),
+                          ({'max_depth': 2, 'first_parent': True}, ['--first-parent', '-n', '2', 'master'])):
+        output = io.StringIO()
+        parser.write_graph(list(selected), output, output_format='jsonl', selected=selected, **options)
+        outputs = [json.loads(line)['sha'] for line in output.getvalue().splitlines()]
+        assert sorted(outputs) == sorted(rev_list(repo_path, *args)), (repo_path, options)
+
+    graph = temp.GitDependencyGraph(repo_path)
+    assert graph.collect_dependencies(refs=['master'], exclude=['master~2'])
+    assert sorted(record[0] for record in graph.dag.iter_records()) == sorted(rev_list(repo_path, 'master~2..master'))
+
+
+#benchmarks
+work_dir = tempfile.mkdtemp()
+heads = []
+for packed in (False, True):
+    scenario = {'commits': 30, 'merge_ratio': 0.2, 'width': 3, 'depth': 1, 'packed': packed, 'seed': 1}
+    repo_path = benchmarks.generate_repo(os.path.join(work_dir, benchmarks.scenario_name(scenario)), **scenario)
+    assert len(git(repo_path, 'rev-list', '--all').split()) == 30 and git(repo_path, 'rev-list', '--merges', '--all').split()
+    assert bool(os.listdir(os.path.join(repo_path, '.git', 'objects', 'pack'))) == packed
+    heads.append(visualizer.GitParser(repo_path).get_head_hash())
+    outputs = benchmarks.run_case('collect_dependencies', repo_path)
+    assert outputs['wall_time_s'] >= 0 and outputs['objects_inflated'] >= 30
+assert heads[0] == heads[1]  # одинаковые параметры дают одинаковую историю
+results = benchmarks.run_benchmarks([scenario], ['get_commit_history'], work_dir)
+assert results[0]['objects_inflated'] > 30 and results[0]['scenario'] == benchmarks.scenario_name(scenario)
+rows = benchmarks.compare_results({'results': results}, {'results': [dict(results[0], wall_time_s=results[0]['wall_time_s'] * 2)]})
+assert len(rows) == 1 and abs(rows[0][4] - 2) < 1e-6
+
+
+#stats
+stats_path = os.path.join(tempfile.mkdtemp(), 'stats.json')
+with stats.session(stats_path) as collector:
+    assert stats.active is collector
+    visualizer.GitParser(packed_path).write_mermaid([head], io.StringIO())
+assert stats.active is None
+with open(stats_path, encoding='utf-8') as f:
+    outputs = json.load(f)
+assert outputs['counters']['objects.commit'] >= 7 and outputs['counters']['objects.packed'] > 0
+assert outputs['counters']['bytes.inflated'] > 0 and outputs['counters']['bytes.compressed'] > 0
+assert {'walk', 'diff', 'emit', 'object_read', 'inflate', 'tree_parse'} <= set(outputs['phases'])
+assert sum(outputs['phases'].values()) <= outputs['wall_time_s'] * 1.01 + 1e-3
+with stats.session() as collector:
+    assert collector is None and stats.active is None
+temp_dir = tempfile.mkdtemp()  # оба генератора temp.py пишут в один отчёт
+with open(os.path.join(temp_dir, 'config.ini'), 'w') as f:
+    f.write(f"[settings]\nvisualization_path = x\nrepository_path = {loose_path}\noutput_file = graph.txt\nuse_cache = no\n"
+            f"[Settings]\nrepository_path = {loose_path}\n")
+subprocess.run([sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'temp.py'), '--stats', 'stats.json'],
+               cwd=temp_dir, capture_output=True, check=True)
+with open(os.path.join(temp_dir, 'stats.json'), encoding='utf-8') as f:
+    outputs = json.load(f)
+assert {'git_log', 'walk'} <= set(outputs['phases']) and outputs['counters']['objects.commit'] >= 7
+output = io.StringIO()
+with contextlib.redirect_stdout(output):
+    assert temp.GitDependencyGraph(loose_path).read_object(head).startswith(b'commit ')
+assert output.getvalue() == ''
+
+
+#parse_tree
+data = b'100644 a b.txt\0' + b'\x01' * 20 + b'40000 dir\0' + b'\x02' * 20 + b'120000 link\0' + b'\x03' * 20 + b'160000 sub\0' + b'\x04' * 20
+assert parse_tree(data) == [(b'a b.txt', b'\x01' * 20, False), (b'dir', b'\x02' * 20, True),
+                            (b'link', b'\x03' * 20, False), (b'sub', b'\x04' * 20, False)]
+for broken in (data[:-1], b'100644 name', b'100644 name\0short'):
+    try:
+        parse_tree(broken)
+        assert False, broken
+    except ValueError:
+        pass
+tree_hash = git(loose_path, 'rev-parse', 'master^{tree}').strip()
+outputs = [(name.decode(), sha.hex(), is_tree) for name, sha, is_tree in parse_tree(ObjectStore(loose_path).read(tree_hash)[1])]
+assert outputs == [(line.split('\t')[1], line.split()[2], line.split()[1] == 'tree') for line in git(loose_path, 'ls-tree', tree_hash).splitlines()]
+assert sorted(visualizer.GitParser(loose_path).parse_tree_object(tree_hash)) == git(loose_path, 'ls-tree', '-r', '--name-only', tree_hash).split()
+assert temp.GitDependencyGraph(packed_path).check_repository_integrity()
+broken_path = tempfile.mkdtemp()
+shutil.copytree(os.path.join(loose_path, '.git'), os.path.join(broken_path, '.git'))
+broken_object = os.path.join(broken_path, '.git', 'objects', tree_hash[:2], tree_hash[2:])
+os.chmod(broken_object, 0o644)
+with open(broken_object, 'wb') as f:
+    f.write(b'not zlib')
+output = io.StringIO()
+with contextlib.redirect_stdout(output):
+    assert not temp.GitDependencyGraph(broken_path).check_repository_integrity()
+assert f'Корневое дерево {tree_hash} коммита HEAD повреждено.' in output.getvalue()
+assert len(benchmarks.run_tree_benchmarks([10000], repeat=1)) == 2
+
+
+#collapse_chains
+dag = visualizer.GitParser(loose_path).build_dag([head])
+outputs = list(collapse_chains(dag, [head]))
+root = git(loose_path, 'rev-list', '--max-parents=0', 'master').strip()
+assert len(outputs) == 4 and outputs[0] == (git(loose_path, 'rev-parse', 'master~2').strip(), f'4 commits: {root[:12]}..{git(loose_path, "rev-parse", "master~2").strip()[:12]}', None, [])
+assert outputs[-1][0] == head and len(outputs[-1][3]) == 2 and outputs[-1][2] == ['2.txt', '1.txt']
+assert list(collapse_chains(dag, [head], min_run=None)) == [dag.record(row) for row in range(len(dag))]
+outputs = list(collapse_chains(dag, [head], max_depth=2, first_parent=True, min_run=None))
+assert [record[0] for record in outputs] == [git(loose_path, 'rev-parse', 'master~1').strip(), head]
+assert outputs[1][3] == [outputs[0][0]] and outputs[0][3] == []
+graph = temp.GitDependencyGraph(loose_path)
+graph.collect_dependencies()
+output = io.StringIO()
+graph.build_graph(output, 'jsonl', min_run=2)
+outputs = [json.loads(line) for line in output.getvalue().splitlines()]
+assert len(outputs) == 4 and all(record['changed_files'] is None for record in outputs)
+
+#dot_lines, jsonl_lines
+records = [('a' * 40, 'say "hi"\\', ['x.txt'], ['b' * 40]), ('b' * 40, 'root', None, [])]
+assert list(dot_lines(records)) == ['digraph commits {\n', '    node [shape=box];\n',
+                                    '    "aaaaaaaaaaaa" [label="say \\"hi\\"\\\\\\nChanged files: x.txt"];\n',
+                                    '    "bbbbbbbbbbbb" -> "aaaaaaaaaaaa";\n', '    "bbbbbbbbbbbb" [label="root"];\n', '}\n']
+assert [json.loads(line) for line in jsonl_lines(records)][0] == {'id': 'a' * 12, 'sha': 'a' * 40, 'message': 'say "hi"\\', 'changed_files': ['x.txt'], 'parents': ['b' * 40]}
+
+
+#GraphDaemon
+daemon_path = tempfile.mkdtemp()
+git(daemon_path, 'clone', '-q', loose_path, '.')
+git(daemon_path, 'config', 'user.email', 'test@example.com')
+git(daemon_path, 'config', 'user.name', 'test')
+graph_daemon = daemon.GraphDaemon(daemon_path, ['master'])
+graph_daemon.load()
+assert len(graph_daemon.dag) == 7 and graph_daemon.refresh() is None
+assert graph_daemon.query() == ''.join(mermaid_lines(graph_daemon.dag.iter_records())).encode('utf-8')
+git(daemon_path, 'commit', '-q', '--allow-empty', '-m', 'daemon commit')
+new_head = git(daemon_path, 'rev-parse', 'HEAD').strip()
+assert graph_daemon.refresh() == 1 and graph_daemon.dag.record(graph_daemon.dag.row(new_head))[3] == [head]
+assert b'daemon commit' in graph_daemon.query()
+git(daemon_path, 'reset', '-q', '--hard', 'HEAD~2')
+assert graph_daemon.refresh() == 5 and graph_daemon.reloads == 1 and head not in graph_daemon.dag
+server = daemon.make_server(graph_daemon, http_port=0)
+threading.Thread(target=server.serve_forever, daemon=True).start()
+with urllib.request.urlopen(f'http://127.0.0.1:{server.server_address[1]}/graph?format=jsonl') as response:
+    assert len(response.read().splitlines()) == 5
+server.shutdown()
+server.server_close()
+
+
+#batch
+fleet_path = tempfile.mkdtemp()
+shutil.copytree(loose_path, os.path.join(fleet_path, 'good'))
+shutil.copytree(loose_path, os.path.join(fleet_path, 'broken'))
+broken_object = os.path.join(fleet_path, 'broken', '.git', 'objects', head[:2], head[2:])
+os.chmod(broken_object, 0o644)
+with open(broken_object, 'wb') as f:
+    f.write(b'not zlib')
+config = configparser.ConfigParser()
+config.read_string(f"""
+[settings]
+cache_dir = {fleet_path}/cache
+[batch]
+repositories = {fleet_path}/*
+output_dir = {fleet_path}/out
+[repository packed]
+repository_path = {packed_path}
+output_format = jsonl
+""")
+jobs = batch.collect_repositories(config)
+assert [(job['name'], os.path.basename(job['output_file'])) for job in jobs] == [('packed', 'packed.jsonl'), ('broken', 'broken.mmd'), ('good', 'good.mmd')]
+report = batch.run_batch(jobs, workers=2, memory_limit_mb=1024, timeout=60)
+assert report['succeeded'] == 2 and [failure['name'] for failure in report['failures']] == ['broken']
+assert report['commits'] == 14 and not os.path.exists(os.path.join(fleet_path, 'out', 'broken.mmd'))
+assert [job['cache_dir'] for job in jobs] == [os.path.join(fleet_path, 'cache', job['name']) for job in jobs]
+assert all(os.path.exists(os.path.join(fleet_path, 'cache', name, 'graph-cache-visualizer.jsonl')) for name in ('packed', 'good'))
+assert not [name for name in os.listdir(os.path.join(fleet_path, 'cache', 'good')) if name.endswith('.tmp')]
+assert batch.run_job(jobs[0], memory_limit_mb=1)['status'] == 'memory'  # ограничение устанавливает дочерний процесс
+with open(os.path.join(fleet_path, 'out', 'good.mmd')) as f:
+    git_parser = visualizer.GitParser(loose_path)
+    output = io.StringIO()
+    git_parser.write_graph(list(dict.fromkeys(git_parser.get_tip_hashes().values())), output)
+    assert f.read() == output.getvalue()
+
+
+#PathFilter, ChangedPathIndex
+path_filter = PathFilter(['./folder3/', 'folder2/4.txt'])
+assert path_filter.paths == (b'folder3', b'folder2/4.txt')
+assert [path_filter.match(path) for path in (b'folder3', b'folder3/5.txt', b'folder2', b'folder2/4.txt', b'folder1', b'folder33')] == [INSIDE, INSIDE, PARTIAL, INSIDE, SKIP, SKIP]
+assert PathFilter(['.']).match(b'anything') == INSIDE and PathFilter(['.']).bloom_hashes is None
+bloom = make_filter(['folder3/5.txt'])
+assert all(filter_contains(bloom, key_hashes(key)) for key in (b'folder3', b'folder3/5.txt'))
+assert make_filter([]) == b'' and not filter_contains(b'', key_hashes(b'folder3'))
+
+
+# Функция получения графа GitParser с фильтром путей: {SHA: (файлы, родители)}
+def filtered_graph(paths, path_index=None, repo_path=loose_path):
+    git_parser = visualizer.GitParser(repo_path)
+    git_parser.path_filter = PathFilter(paths)
+    git_parser.path_index = path_index
+    dag = git_parser.build_dag(list(dict.fromkeys(git_parser.get_tip_hashes().values())))
+    return {commit_hash: (changed_files, parents) for commit_hash, _, changed_files, parents in dag.iter_records()}
+
+
+# Все три генератора отбирают одни и те же коммиты; в истории с ветками встречаются слияния, которые
+# не меняли пути, но соединяют ветки с их изменениями (git --full-history --parents их оставляет),
+# и слияния, внёсшие путь относительно ветки, которая его не трогала
+merge_path = benchmarks.generate_repo(os.path.join(work_dir, 'paths'), commits=400, merge_ratio=0.2, width=3, depth=1, packed=True, seed=3)
+side_path = tempfile.mkdtemp()
+git(side_path, 'init', '-q', '-b', 'master')
+git(side_path, 'config', 'user.email', 'test@example.com')
+git(side_path, 'config', 'user.name', 'test')
+git(side_path, 'commit', '-q', '--allow-empty', '-m', 'root')
+git(side_path, 'checkout', '-q', '-b', 'side')
+with open(os.path.join(side_path, 'b'), 'w') as f:
+    f.write('b\n')
+git(side_path, 'add', 'b')
+git(side_path, 'commit', '-q', '-m', 'add b')
+git(side_path, 'checkout', '-q', 'master')
+os.makedirs(os.path.join(side_path, 'd'))
+with open(os.path.join(side_path, 'd', 'z'), 'w') as f:
+    f.write('z\n')
+git(side_path, 'add', 'd/z')
+git(side_path, 'commit', '-q', '-m', 'add d/z')
+git(side_path, 'merge', '-q', '--no-ff', 'side', '-m', 'merge side')
+for repo_path, paths in ((loose_path, ['folder3']), (loose_path, ['1.txt']), (loose_path, ['folder2/4.txt', '2.txt']),
+                         (loose_path, ['missing']), (merge_path, ['d1/']), (merge_path, ['d0/f1.txt', 'd2']), (side_path, ['d'])):
+    outputs = filtered_graph(paths, repo_path=repo_path)
+    assert all(files and all(PathFilter(paths).matches(path) for path in files) for files, _ in outputs.values())
+    outputs = {commit_hash: parents for commit_hash, (_, parents) in outputs.items()}
+    assert {record[0]: record[3] for record in temp.iter_path_records(repo_path, paths)} == outputs, (repo_path, paths)
+    graph = temp.GitDependencyGraph(repo_path)
+    graph.collect_dependencies()
+    graph.filter_paths(paths)
+    assert {record[0]: record[3] for record in graph.dag.iter_records()} == outputs, (repo_path, paths)
+    assert set(outputs) == set(git(repo_path, 'log', '--all', '--full-history', '--format=%H', '--', *paths).split())
+assert len(outputs) == 2  # side_path: 'add d/z' и слияние, внёсшее d относительно ветки side
+outputs = filtered_graph(['1.txt'])
+assert outputs[head] == (['1.txt'], [git(loose_path, 'rev-parse', 'master~1').strip(), git(loose_path, 'rev-parse', 'master~4').strip()])
+index_path = os.path.join(tempfile.mkdtemp(), 'index.bidx')
+path_index = ChangedPathIndex(index_path)
+git_parser = visualizer.GitParser(loose_path)
+git_parser.path_index = path_index
+git_parser.build_dag([head])
+path_index.save()
+path_index = ChangedPathIndex(index_path)
+assert path_index.load() and len(path_index) == 7
+assert path_index.might_touch(head, PathFilter(['folder3']).bloom_hashes) is False and path_index.might_touch('0' * 40, [[]]) is None
+assert filtered_graph(['1.txt'], path_index) == filtered_graph(['1.txt'])
+graph = temp.GitDependencyGraph(loose_path)
+graph.collect_dependencies()
+graph.filter_paths(['1.txt'], path_index)
+assert {commit_hash: parents for commit_hash, _, _, parents in graph.dag.iter_records()} == {commit_hash: parents for commit_hash, (_, parents) in outputs.items()}
+assert [record[0] for record in temp.iter_git_log(loose_path, ('--all',), ['folder3'])] == git(loose_path, 'log', '--all', '--full-history', '--format=%H', '--', 'folder3').split()
+with open(index_path, 'r+b') as f:
+    f.seek(10)
+    f.write(b'\xff')
+with contextlib.redirect_stderr(io.StringIO()):
+    assert not ChangedPathIndex(index_path).load()
+
+
+#churn_report
+dag = visualizer.GitParser(loose_path).build_dag([head])
+report = churn.churn_report(dag)
+assert report['commits'] == 5 and report['co_changes'] == []
+assert report['files'][0] == {'path': '1.txt', 'changes': 2, 'last_commit': git(loose_path, 'rev-parse', 'master~1').strip()}
+assert {record['path']: record['changes'] for record in report['directories']} == {'folder2': 1, 'folder3': 1}
+assert churn.churn_report(dag, include_merges=True)['files'][0]['last_commit'] == head
+dag = CommitDag()
+for index, files in enumerate([['a/x', 'a/y'], ['a/x', 'a/y', 'b/z'], ['a/x', 'b/z'], ['a/x'] * 2, ['c'] + [f'd/{n}' for n in range(5)]]):
+    dag.add_commit(f'{index:040x}', str(index), [f'{index - 1:040x}'] if index else [], files)
+report = churn.churn_report(dag, top=3, max_co_change_files=4)
+assert report['files'][0] == {'path': 'a/x', 'changes': 4, 'last_commit': f'{3:040x}'}
+assert report['directories'][:2] == [{'path': 'a', 'changes': 4, 'last_commit': f'{3:040x}'}, {'path': 'b', 'changes': 2, 'last_commit': f'{2:040x}'}]
+assert report['co_changes'] == [{'paths': ['a/x', 'a/y'], 'commits': 2}, {'paths': ['a/x', 'b/z'], 'commits': 2}, {'paths': ['a/y', 'b/z'], 'commits': 1}]
+numpy_module, churn.np = churn.np, None  # те же результаты без NumPy
+fallback = churn.churn_report(dag, top=3, max_co_change_files=4)
+churn.np = numpy_module
+assert fallback.pop('engine') == 'python' and report.pop('engine') in ('numpy', 'python') and fallback == report
+
+
+print('OK')
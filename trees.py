@@ -0,0 +1,30 @@
+TREE_MODE_FIRST_BYTE = ord('4')  # режим поддерева записывается как "40000", остальные режимы начинаются с "1"
+
+
+# Функция разбора содержимого объекта-дерева
+def parse_tree(data):
+    """Возвращает список записей (имя, SHA, является ли деревом) из распакованного объекта-дерева.
+
+    Запись дерева — "<режим> <имя>\\0<20 байт SHA>", причём режим переменной длины
+    ("100644", "120000", "40000"), поэтому его конец ищется по пробелу. Буфер не копируется
+    и не декодируется: поиск идёт прямо по нему, из него вырезаются только имя и SHA,
+    имена остаются байтами до вывода (см. decode_name).
+    """
+    entries = []
+    append = entries.append
+    find = data.find
+    index = 0
+    end = len(data)
+    while index < end:
+        space = find(b' ', index)
+        name_end = find(b'\0', space)
+        if space < 0 or name_end < 0 or name_end + 21 > end:
+            raise ValueError(f"Повреждённая запись дерева по смещению {index}")
+        append((data[space + 1:name_end], data[name_end + 1:name_end + 21], data[index] == TREE_MODE_FIRST_BYTE))
+        index = name_end + 21
+    return entries
+
+
+# Функция перевода имени или пути из байтов в строку для вывода
+def decode_name(name):
+    return name.decode('utf-8', errors='replace')
@@ -1,160 +1,515 @@
-import os
-import zlib
+import sys
 import configparser
 import argparse
+import multiprocessing
+from array import array
+from collections import OrderedDict, deque
+
+import stats
+from gitstore import ObjectStore, OBJ_TREE
+from trees import parse_tree, decode_name
+from commitgraph import CommitGraph
+from dag import CommitDag
+from refs import RefStore
+from revwalk import parse_revisions, walk_range
+from emitters import EMITTERS, mermaid_lines, write_lines
+from summarize import collapse_chains
+from history_cache import open_history_cache
+from bloom import open_path_index
+from pathfilter import PathFilter
+from churn import churn_report
 
 
 class GitParser:
-    def __init__(self, repo_path):
+    def __init__(self, repo_path, tree_cache_size=4096, history_cache=None):
         self.repo_path = repo_path
+        self.store = ObjectStore(repo_path)  # loose-объекты и pack-файлы
+        self.refs = RefStore(repo_path, self.store)  # loose-ссылки, packed-refs и HEAD
+        self.tree_cache = OrderedDict()      # LRU-кэш разобранных деревьев по SHA
+        self.tree_cache_size = tree_cache_size
+        self.history_cache = history_cache   # кэш обработанных коммитов между запусками
+        self.commit_graph = CommitGraph.open(repo_path)  # родители и деревья без распаковки коммитов
+        self.path_filter = None              # PathFilter: граф только коммитов, изменивших эти пути
+        self.path_index = None               # ChangedPathIndex: фильтры Блума изменённых путей по SHA
+
+
+    # Функция получения записей одного объекта-дерева по 20-байтовому SHA (с кэшем по SHA дерева).
+    # Возвращает {имя (байты): (является ли деревом, SHA (20 байт))} или None
+    def read_tree_entries(self, tree_sha):
+        entries = self.tree_cache.get(tree_sha)
+        if stats.active is not None:
+            stats.active.count('tree_cache.hit' if entries is not None else 'tree_cache.miss')
+        if entries is not None:
+            self.tree_cache.move_to_end(tree_sha)
+            return entries
+
+        raw = self.store.read_raw(tree_sha)
+        if raw is None or raw[0] != OBJ_TREE:
+            return None
+        collector = stats.active
+        if collector is not None:
+            collector.enter('tree_parse')
+        entries = {name: (is_tree, sha) for name, sha, is_tree in parse_tree(raw[1])}
+        if collector is not None:
+            collector.exit('tree_parse')
+            collector.count('tree_entries', len(entries))
 
+        self.tree_cache[tree_sha] = entries
+        if len(self.tree_cache) > self.tree_cache_size:
+            self.tree_cache.popitem(last=False)
+        return entries
 
-    # Функция получения данных о файлах из объекта-дерева
+
+    # Функция получения данных о файлах из объекта-дерева: {путь: SHA файла}
     def parse_tree_object(self, tree_hash):
-        path = os.path.join('.git', 'objects', tree_hash[:2], tree_hash[2:])
-        if not os.path.isfile(path):
+        files_info = self.flatten_tree(bytes.fromhex(tree_hash), b'')
+        if files_info is None:
             return None
-        with open(path, 'rb') as f:
-            data = f.read()
-        data = zlib.decompress(data)
-
-        header_end = data.index(b'\0')
-        content = data[header_end + 1:]
-        index = 0
-        files_info = {}
-
-        while index < len(content):
-            # Читаем режим доступа
-            mode_end = index + 6
-            mode = content[index:mode_end].decode()
-            index = mode_end
-            
-            # Находим конец имени файла
-            name_end = content.index(b'\0', index)
-            name = content[index:name_end].decode()
-            index = name_end + 1 
-            
-            # Получаем хеш
-            hash_value = content[index:index + 20] 
-            index += 20 
-            
-            # Проверяем, является ли объект деревом или файлом
-            if mode.startswith('40000'):  # если это дерево
-                sub_tree_hash = hash_value.hex()
-                sub_files_info = self.parse_tree_object(sub_tree_hash)
-                if sub_files_info:
-                    for sub_name in sub_files_info:
-                        files_info[f"{name}/{sub_name}"] = sub_files_info[sub_name]
-            else: 
-                files_info[name] = hash_value.hex()
+        return {decode_name(path): sha.hex() for path, sha in files_info}
+
 
+    # Функция получения списка (путь, SHA) всех файлов дерева; пути остаются байтами
+    def flatten_tree(self, tree_sha, prefix):
+        entries = self.read_tree_entries(tree_sha)
+        if entries is None:
+            return None
+        files_info = []
+        for name, (is_tree, sha) in entries.items():
+            if is_tree:  # если это дерево
+                files_info.extend(self.flatten_tree(sha, prefix + name + b'/') or ())
+            else:
+                files_info.append((prefix + name, sha))
         return files_info
 
 
+    # Функция сравнения двух деревьев (hex-SHA или None): возвращает (изменённые и добавленные, удалённые) пути
+    def diff_trees(self, old_tree_hash, new_tree_hash, prefix='', path_filter=None):
+        changed, deleted = self.diff_tree_shas(bytes.fromhex(old_tree_hash) if old_tree_hash else None,
+                                               bytes.fromhex(new_tree_hash) if new_tree_hash else None,
+                                               prefix.encode(), path_filter)
+        return [decode_name(path) for path in changed], [decode_name(path) for path in deleted]
+
+
+    # Функция сравнения двух деревьев по 20-байтовым SHA; пути — байты.
+    # С фильтром путей раскрываются только поддеревья на пути к запрошенным и внутри них
+    def diff_tree_shas(self, old_tree_sha, new_tree_sha, prefix, path_filter=None):
+        if old_tree_sha == new_tree_sha:  # одинаковые поддеревья не раскрываем
+            return [], []
+        old_entries = (self.read_tree_entries(old_tree_sha) or {}) if old_tree_sha else {}
+        new_entries = (self.read_tree_entries(new_tree_sha) or {}) if new_tree_sha else {}
+        scopes = None  # имя -> фильтр для поддерева (None внутри запрошенного пути)
+        if path_filter is not None:
+            old_entries, scopes = path_filter.restrict(old_entries, prefix)
+            new_entries, new_scopes = path_filter.restrict(new_entries, prefix)
+            scopes.update(new_scopes)  # фильтр поддерева зависит только от пути
+        changed = []
+        deleted = []
+        sub_deleted = {}  # удалённые файлы внутри поддеревьев, в порядке старого дерева
+
+        for name, (is_tree, sha) in new_entries.items():
+            path = prefix + name
+            old_entry = old_entries.get(name)
+            old_tree = old_entry[1] if old_entry and old_entry[0] else None
+            if is_tree:
+                sub_changed, sub_deleted[name] = self.diff_tree_shas(old_tree, sha, path + b'/', scopes and scopes[name])
+                changed.extend(sub_changed)
+            elif old_entry is None or old_entry[0]:
+                changed.append(path)  # Файл добавлен
+                if old_tree:
+                    sub_deleted[name] = self.diff_tree_shas(old_tree, None, path + b'/', scopes and scopes[name])[1]
+            elif old_entry[1] != sha:
+                changed.append(path)  # Файл изменился
+
+        for name, (is_tree, sha) in old_entries.items():
+            new_entry = new_entries.get(name)
+            if is_tree:
+                if name in sub_deleted:
+                    deleted.extend(sub_deleted[name])
+                elif new_entry is None:
+                    deleted.extend(self.diff_tree_shas(sha, None, prefix + name + b'/', scopes and scopes[name])[1])
+            elif new_entry is None or new_entry[0]:
+                deleted.append(prefix + name)  # Файл удален или заменён деревом
+
+        return changed, deleted
+
+
     # Функция получения данных о коммите из объекта-коммита
     def parse_commit_object(self, commit_hash):
-        path = os.path.join('.git', 'objects', commit_hash[:2], commit_hash[2:])
-        if not os.path.isfile(path):
+        obj_type, data = self.store.read(commit_hash)
+        if obj_type is None:
             return None, None
-        with open(path, 'rb') as f:
-            data = f.read()
-        data = zlib.decompress(data)
-
-        header_end = data.index(b'\0')
-        header = data[:header_end].decode()
-        obj_type, size = header.split(' ')
-        content = data[header_end + 1:].decode('utf-8').splitlines()
+        content = data.decode('utf-8').splitlines()
 
         return obj_type, content
 
 
-    # Функция обработки коммита
-    def get_commit_info(self, commit_hash):
+    # Функция чтения заголовков коммита: дерево, родители, сообщение и время коммита
+    def read_commit_header(self, commit_hash):
         obj_type, content = self.parse_commit_object(commit_hash)
         if obj_type != 'commit':
             return None
-        
-        commit_info = {
-            'name': content[-1],  # Сообщение коммита 
-            'files': {},          # Текущие файлы
-            'changed_files': [],  # Измененные файлы
-            'parents': []         # Родители
-        }
 
+        tree_hash = None
+        parent_hashes = []
+        commit_time = 0
         for line in content:
-            if line.startswith('parent'):
-                parent_hash = line.split()[1]
-                commit_info['parents'].append(self.get_commit_info(parent_hash))  # Добавляем родителя в список
-            elif line.startswith('tree'):
+            if line.startswith('parent '):
+                parent_hashes.append(line.split()[1])
+            elif line.startswith('tree '):
                 tree_hash = line.split()[1]
-                files = self.parse_tree_object(tree_hash)
-                commit_info['files'] = files  # Сохраняем файлы и их хэши для данного коммита
-
-        # Сравниваем файлы с родительскими коммитами
-        for parent in commit_info['parents']:
-            parent_files = parent['files']
-            
-            # Сравниваем файлы текущего коммита с файлами родительского
-            for filename, current_hash in commit_info['files'].items():
-                if filename in parent_files:
-                    parent_hash = parent_files[filename]
-                    if current_hash != parent_hash:
-                        commit_info['changed_files'].append(filename)  # Файл изменился
-                else:
-                    commit_info['changed_files'].append(filename)  # Файл добавлен
-
-            # Проверяем, есть ли файлы в родительском коммите, которых нет в текущем
-            for filename in parent_files:
-                if filename not in commit_info['files']:
-                    commit_info['changed_files'].append(filename)  # Файл удален
-
-        return commit_info
+            elif line.startswith('committer '):
+                commit_time = int(line.rsplit(' ', 2)[1])
+            elif not line:  # конец заголовков
+                break
+        return tree_hash, parent_hashes, content[-1], commit_time
+
+
+    # Функция выбора коммитов диапазона (A..B, ^A, --max-count, --since/--until) ленивым обходом.
+    # Возвращает {SHA: заголовок коммита или None}, чтобы не читать выбранные коммиты повторно
+    def select_commits(self, include, exclude=(), max_count=None, since=None, until=None):
+        headers = {}
+
+        def read_commit(commit_hash):
+            record = self.commit_graph.get(commit_hash) if self.commit_graph else None
+            if record is not None:
+                return record[1], record[3], record[2]
+            header = self.read_commit_header(commit_hash)
+            if header is None:
+                return None
+            headers[commit_hash] = header
+            return header[1], header[3], None
+
+        include = list(dict.fromkeys(self.refs.select_tips(include).values()))
+        exclude = list(dict.fromkeys(self.refs.select_tips(exclude).values())) if exclude else []
+        selected = walk_range(include, exclude, read_commit, max_count, since, until)
+        return {commit_hash: headers.get(commit_hash) for commit_hash in selected}
+
+
+    # Функция выбора коммитов по списку ревизий в стиле git rev-list
+    def select_revisions(self, revisions, max_count=None, since=None, until=None):
+        include, exclude = parse_revisions(revisions)
+        return self.select_commits(include or ['HEAD'], exclude, max_count, since, until)
+
+
+    # Функция обхода графа коммитов: каждый коммит разбирается ровно один раз.
+    # Коммиты с номером поколения меньше min_generation не раскрываются (обход останавливается на границе).
+    # selected (из select_commits) ограничивает обход выбранными коммитами.
+    # Скелет графа и топологический порядок хранятся в массивах CommitDag; словарь коммита создаётся
+    # только при выдаче, а его список файлов после выдачи обходом не удерживается
+    def iter_commits(self, commit_hashes, jobs=1, min_generation=None, selected=None):
+        skeleton = CommitDag()      # SHA, родители, дерево и сообщение каждого коммита обхода
+        files = []                  # строка -> изменённые файлы (None — ещё не вычислены)
+        generations = array('I')    # строка -> номер поколения из commit-graph (0 — нет)
+        to_visit = list(commit_hashes)
+
+        # Собираем скелет графа явным стеком вместо рекурсии
+        while to_visit:
+            commit_hash = to_visit.pop()
+            if commit_hash in skeleton or (selected is not None and commit_hash not in selected):
+                continue
+            cached = self.history_cache.get(commit_hash) if self.history_cache else None
+            graph_record = self.commit_graph.get(commit_hash) if self.commit_graph else None
+            generation = graph_record[2] if graph_record else None
+            if stats.active is not None:
+                stats.active.count('history_cache.hit' if cached is not None else 'history_cache.miss')
+                stats.active.count('commit_graph.hit' if graph_record is not None else 'commit_graph.miss')
+            if min_generation is not None and generation is not None and generation < min_generation:
+                continue
+            if cached is not None:  # коммит обработан при прошлом запуске: объект не читаем
+                tree_hash, parents, name, changed_files = cached
+            elif graph_record is not None:  # родители и дерево из commit-graph, сообщение прочитаем позже
+                tree_hash, parents = graph_record[:2]
+                name = changed_files = None
+            else:
+                header = (selected.get(commit_hash) if selected else None) or self.read_commit_header(commit_hash)
+                if header is None:
+                    continue
+                tree_hash, parents, name = header[:3]
+                changed_files = None
+            if self.path_filter is not None:
+                changed_files = self.filtered_changed_files(commit_hash, parents, changed_files)
+            elif changed_files is not None and self.path_index is not None:
+                self.path_index.add(commit_hash, changed_files)
+            skeleton.add_commit(commit_hash, name, parents, tree_hash=tree_hash)
+            files.append(changed_files)
+            generations.append(generation or 0)
+            to_visit.extend(parent for parent in parents if parent not in skeleton)
+
+        # Топологический порядок: коммит обрабатывается после всех своих родителей.
+        # Потомки хранятся в формате CSR; отсутствующие объекты и коммиты за границей обхода пропускаем
+        count = len(skeleton)
+        pending = array('I', [0]) * count
+        child_offsets = array('I', [0]) * (count + 1)
+        for row in range(count):
+            for parent in skeleton.parents(row):
+                if skeleton.rows[parent] >= 0:
+                    pending[row] += 1
+                    child_offsets[skeleton.rows[parent] + 1] += 1
+        for row in range(count):
+            child_offsets[row + 1] += child_offsets[row]
+        children = array('I', [0]) * child_offsets[count]
+        filled = child_offsets[:count]
+        for row in range(count):
+            for parent in skeleton.parents(row):
+                parent_row = skeleton.rows[parent]
+                if parent_row >= 0:
+                    children[filled[parent_row]] = row
+                    filled[parent_row] += 1
+        order = array('I')
+        queue = deque(row for row in range(count) if pending[row] == 0)
+        while queue:
+            row = queue.popleft()
+            order.append(row)
+            for child in children[child_offsets[row]:child_offsets[row + 1]]:
+                pending[child] -= 1
+                if pending[child] == 0:
+                    queue.append(child)
+        del pending, child_offsets, children, filled
+        needs_diff = bytearray(changed_files is None for changed_files in files)
+
+        # Функция получения деревьев родителей коммита (ради рабочих процессов пула — без словаря коммита)
+        def parent_trees(row):
+            walked = {}
+            for parent in skeleton.parents(row):
+                if skeleton.rows[parent] >= 0:
+                    tree = skeleton.records[skeleton.rows[parent]].tree
+                    walked[skeleton.sha(parent)] = tree.hex() if tree else None
+            return self.parent_trees([skeleton.sha(parent) for parent in skeleton.parents(row)], walked)
+
+        # Функция выдачи коммитов в топологическом порядке: файлы отдаются вызывающему и забываются
+        def iter_infos():
+            for row in order:
+                record = skeleton.records[row]
+                parents = skeleton.parents(row)
+                commit_info = {
+                    'sha': skeleton.sha(skeleton.row_ids[row]),    # SHA коммита
+                    'tree': record.tree.hex() if record.tree else None,  # SHA корневого дерева
+                    'name': record.name,                           # Сообщение коммита (None — ещё не прочитано)
+                    'changed_files': files[row],                   # Измененные файлы (None — ещё не вычислены)
+                    'parents': [skeleton.sha(parent) for parent in parents if skeleton.rows[parent] >= 0],  # SHA родителей в обходе
+                    'parent_hashes': [skeleton.sha(parent) for parent in parents],  # SHA всех родителей, включая не попавшие в обход
+                    'generation': generations[row] or None         # Номер поколения из commit-graph (если есть)
+                }
+                files[row] = None
+                yield row, commit_info
+
+        todo = sum(needs_diff)
+        if jobs > 1 and todo > 1:
+            tasks = ((skeleton.records[row].tree.hex() if skeleton.records[row].tree else None, parent_trees(row))
+                     for row in order if needs_diff[row])
+            yield from self.iter_parallel_diffs(iter_infos(), tasks, todo, jobs)
+            return
+        for row, commit_info in iter_infos():
+            if commit_info['changed_files'] is None:
+                with stats.phase('diff'):
+                    commit_info['changed_files'] = self.diff_against_parents(commit_info['tree'], parent_trees(row))
+                self.remember_commit(commit_info)
+            self.load_commit_name(commit_info)
+            yield commit_info
+
+
+    # Функция распределения сравнения деревьев по пулу процессов (порядок результатов сохраняется).
+    # tasks — (дерево, деревья родителей) коммитов из commit_infos, которым нужно сравнение
+    def iter_parallel_diffs(self, commit_infos, tasks, todo, jobs):
+        chunk_size = max(1, min(256, todo // (jobs * 8)))
+        collect_stats = stats.active is not None  # рабочие процессы возвращают свою статистику вместе с результатом
+        initargs = (self.repo_path, self.tree_cache_size, collect_stats, self.path_filter)
+        with multiprocessing.Pool(jobs, initializer=_init_diff_worker, initargs=initargs) as pool:
+            results = pool.imap(_diff_worker, tasks, chunk_size)
+            for _, commit_info in commit_infos:
+                if commit_info['changed_files'] is None:
+                    with stats.phase('diff'):  # ожидание результата от пула
+                        result = next(results)
+                    if collect_stats:
+                        result, snapshot = result
+                        stats.active.merge(snapshot)
+                    commit_info['changed_files'] = result
+                    self.remember_commit(commit_info)
+                self.load_commit_name(commit_info)
+                yield commit_info
+
+
+    # Функция чтения сообщения коммита, узел которого построен по commit-graph
+    def load_commit_name(self, commit_info):
+        if commit_info['name'] is None:
+            header = self.read_commit_header(commit_info['sha'])
+            commit_info['name'] = header[2] if header else ''
+
+
+    # Функция получения изменённых файлов коммита под фильтром путей без сравнения деревьев: из полного
+    # списка (кэш истории) или по индексу изменённых путей. None — деревья придётся сравнить
+    def filtered_changed_files(self, commit_hash, parents, changed_files):
+        if not parents:
+            return None  # корневой коммит под фильтром сравнивается с пустым деревом, как в `git log -- path`
+        if changed_files is not None:
+            if self.path_index is not None:
+                self.path_index.add(commit_hash, changed_files)
+            return [path for path in changed_files if self.path_filter.matches(path)]
+        hashes = self.path_filter.bloom_hashes
+        if self.path_index is not None and hashes is not None and self.path_index.might_touch(commit_hash, hashes) is False:
+            return []  # коммит точно не менял эти пути: его деревья не читаем
+        return None
+
+
+    # Функция сохранения обработанного коммита в кэш истории и индекс изменённых путей
+    # (под фильтром путей список файлов неполный и не сохраняется)
+    def remember_commit(self, commit_info):
+        if self.path_filter is not None:
+            return
+        if self.path_index is not None:
+            self.path_index.add(commit_info['sha'], commit_info['changed_files'])
+        if self.history_cache is not None:
+            self.load_commit_name(commit_info)
+            self.history_cache.add(commit_info['sha'], commit_info['tree'], commit_info['parent_hashes'], commit_info['name'], commit_info['changed_files'])
+
+
+    # Функция получения таблицы коммитов в топологическом порядке; родители связываются со своими узлами
+    def walk_commits(self, commit_hashes, jobs=1, min_generation=None, selected=None):
+        nodes = {}
+        for commit_info in stats.iterate('walk', self.iter_commits(commit_hashes, jobs, min_generation, selected)):
+            commit_info['parents'] = [nodes[parent] for parent in commit_info['parents']]  # родители выданы раньше
+            nodes[commit_info['sha']] = commit_info
+        return nodes
+
+
+    # Функция получения файлов, измененных деревом коммита относительно деревьев родителей
+    def diff_against_parents(self, tree_hash, parent_tree_hashes):
+        changed_files = []
+        if self.path_filter is not None and not parent_tree_hashes:
+            parent_tree_hashes = [None]  # корневой коммит под фильтром сравнивается с пустым деревом
+        for parent_tree_hash in parent_tree_hashes:
+            changed, deleted = self.diff_trees(parent_tree_hash, tree_hash, path_filter=self.path_filter)
+            changed_files.extend(changed)
+            changed_files.extend(deleted)
+        return changed_files
+
+
+    # Функция получения деревьев всех родителей; walked — {SHA: дерево} родителей, попавших в обход
+    def parent_trees(self, parent_hashes, walked):
+        trees = []
+        for parent_hash in parent_hashes:
+            if parent_hash in walked:
+                trees.append(walked[parent_hash])
+                continue
+            record = self.commit_graph.get(parent_hash) if self.commit_graph else None
+            header = record or self.read_commit_header(parent_hash)
+            if header is not None:  # отсутствующих родителей пропускаем
+                trees.append(header[0])
+        return trees
+
+
+    # Функция обработки коммита
+    def get_commit_info(self, commit_hash):
+        return self.walk_commits([commit_hash]).get(commit_hash)
+
+
+    # Функция получения коммита, на который указывает HEAD (ветка или отсоединённый HEAD)
+    def get_head_hash(self):
+        return self.refs.select_tips(['HEAD']).get('HEAD')
+
+
+    # Функция получения вершин выбранных ссылок (по умолчанию все ссылки и HEAD)
+    def get_tip_hashes(self, names=None):
+        return self.refs.select_tips(names)
 
 
     # Функция получения истории всех коммитов
     def get_commit_history(self):
-        os.chdir(self.repo_path)
-        
-        # Получаем последний коммит из ветки master (или другой ветки по умолчанию)
-        branch_path = os.path.join(self.repo_path, '.git', 'refs', 'heads', 'master')  
-        with open(branch_path, 'r', encoding='utf-8') as f:
-            commit_hash = f.read().strip()
-            commit_info = self.get_commit_info(commit_hash)
-        return commit_info
+        return self.get_commit_info(self.get_head_hash())
+
+
+    # Функция перевода записи коммита в формат генераторов графа
+    @staticmethod
+    def commit_record(commit_info):
+        return commit_info['sha'], commit_info['name'], commit_info['changed_files'], [parent['sha'] for parent in commit_info['parents']]
 
 
     # Функция перевода на язык mermaid
     def generate_mermaid(self, commit):
-        mermaid_string = "graph TD;\n"
+        records = []
         visited_commits = set()  # Множество для отслеживания уже посещенных коммитов
+        to_visit = [commit]
+        while to_visit:
+            commit = to_visit.pop()
+            if commit['sha'] in visited_commits:
+                continue
+            visited_commits.add(commit['sha'])
+            records.append(self.commit_record(commit))
+            to_visit.extend(reversed(commit['parents']))
+        return ''.join(stats.iterate('emit', mermaid_lines(records)))
+
+
+    # Функция заполнения компактного графа по мере обхода: отдаёт записи, прочитанные из графа.
+    # С фильтром путей коммиты, не изменившие эти пути, пропускаются, а их потомки связываются
+    # с ближайшими оставшимися предками
+    def iter_dag_records(self, commit_hashes, dag, jobs=1, min_generation=None, selected=None):
+        skipped = {}  # SHA пропущенного коммита -> ближайшие оставшиеся предки
+        for commit_info in stats.iterate('walk', self.iter_commits(commit_hashes, jobs, min_generation, selected)):
+            parents = commit_info['parents']
+            if self.path_filter is not None:
+                parents = list(dict.fromkeys(ancestor for parent in parents for ancestor in skipped.get(parent, (parent,))))
+                if not commit_info['changed_files']:
+                    skipped[commit_info['sha']] = parents
+                    continue
+            row = dag.add_commit(commit_info['sha'], commit_info['name'], parents, commit_info['changed_files'], commit_info['tree'])
+            yield dag.record(row)
+
+
+    # Функция построения компактного графа коммитов
+    def build_dag(self, commit_hashes, jobs=1, min_generation=None, selected=None):
+        dag = CommitDag()
+        for _ in self.iter_dag_records(commit_hashes, dag, jobs, min_generation, selected):
+            pass
+        return dag
+
+
+    # Функция потоковой записи графа mermaid по мере обхода истории
+    def write_mermaid(self, commit_hashes, *outputs, jobs=1, dag=None, selected=None):
+        self.write_graph(commit_hashes, *outputs, jobs=jobs, dag=dag, selected=selected)
+
+
+    # Функция записи графа в выбранном формате (mermaid, dot, jsonl). Если задано сворачивание
+    # линейных участков или ограничения глубины и первых родителей, граф сначала строится целиком
+    def write_graph(self, commit_hashes, *outputs, output_format='mermaid', jobs=1, dag=None, selected=None,
+                    min_run=None, max_depth=None, first_parent=False):
+        dag = CommitDag() if dag is None else dag
+        if min_run is None and max_depth is None and not first_parent:
+            records = stats.iterate('dag', self.iter_dag_records(commit_hashes, dag, jobs, selected=selected))
+        else:
+            for _ in stats.iterate('dag', self.iter_dag_records(commit_hashes, dag, jobs, selected=selected)):
+                pass
+            # Вершины — ссылки; в выбранном диапазоне (commit_hashes — все его коммиты) и под фильтром
+            # путей — коммиты графа без потомков, иначе каждый коммит оказался бы на глубине 0
+            tips = commit_hashes if self.path_filter is None and selected is None else None
+            records = stats.iterate('summarize', collapse_chains(dag, tips, max_depth, first_parent, min_run))
+        write_lines(stats.iterate('emit', EMITTERS[output_format](records)), *outputs)
+
+
+# Парсер рабочего процесса пула: создаётся один раз на процесс
+_worker_parser = None
+
+
+# Функция инициализации рабочего процесса: открывает репозиторий самостоятельно
+def _init_diff_worker(repo_path, tree_cache_size, collect_stats=False, path_filter=None):
+    global _worker_parser
+    _worker_parser = GitParser(repo_path, tree_cache_size)
+    _worker_parser.path_filter = path_filter
+    stats.active = stats.Stats() if collect_stats else None
+
+
+# Функция рабочего процесса: получает только SHA деревьев, возвращает список изменённых путей
+# (и накопленную статистику, если она собирается)
+def _diff_worker(task):
+    tree_hash, parent_tree_hashes = task
+    if stats.active is None:
+        return _worker_parser.diff_against_parents(tree_hash, parent_tree_hashes)
+    with stats.active.phase('diff'):
+        result = _worker_parser.diff_against_parents(tree_hash, parent_tree_hashes)
+    return result, stats.active.take()
+
 
-        # Функция для рекурсивного обхода коммитов
-        def traverse(commit):
-            nonlocal mermaid_string
-            commit_message = commit['name']
-            changed_files = ', '.join(commit.get('changed_files', [])) or 'No changes'
-
-            # Создаем уникальный идентификатор для коммита на основе его сообщения
-            commit_id = commit_message.replace(' ', '_').replace('-', '_')
-
-            # Проверяем, был ли уже добавлен этот коммит
-            if commit_id not in visited_commits:
-                visited_commits.add(commit_id)  # Добавляем коммит в множество посещенных
-                # Добавляем текущий коммит в строку mermaid
-                mermaid_string += f"    {commit_id}({commit_message}\nChanged files: {changed_files})\n"
-            
-                # Если есть родительские коммиты, добавляем связи
-                for parent in commit['parents']:
-                    parent_message = parent['name']
-                    parent_id = parent_message.replace(' ', '_').replace('-', '_')
-                    mermaid_string += f"    {parent_id} --> {commit_id}\n"
-                    traverse(parent)  # Рекурсивно обходим родительский коммит
-
-        traverse(commit)
-        return mermaid_string
-
-
-def main(config_path):
+def main(config_path, jobs=1, revisions=(), max_count=None, since=None, until=None,
+         output_format='mermaid', collapse=False, max_depth=None, first_parent=False, paths=(), churn=None, churn_top=20):
     config = configparser.ConfigParser()
     config.read(config_path)
 
@@ -162,9 +517,35 @@ def main(config_path):
 
     if repo_path:
         git_parser = GitParser(repo_path)
-        commit_history = git_parser.get_commit_history()
-        mermaid_output = git_parser.generate_mermaid(commit_history)
-        print(mermaid_output)
+        with stats.phase('cache_load'):
+            git_parser.history_cache = open_history_cache(config['settings'], repo_path, 'visualizer', git_parser.store.has_object)
+            git_parser.path_index = open_path_index(config['settings'], repo_path)
+        paths = paths or config.get('settings', 'paths', fallback='').split()
+        if paths:
+            git_parser.path_filter = PathFilter(paths)
+        with stats.phase('refs'):
+            tips = git_parser.get_tip_hashes(config.get('settings', 'refs', fallback='').split())  # Пусто — все ссылки
+        commit_hashes = list(dict.fromkeys(tips.values()))
+        selected = None
+        if revisions or max_count is not None or since or until:
+            # Ограниченный диапазон: ленивый обход останавливается на его границе
+            include, exclude = parse_revisions(revisions)
+            with stats.phase('select'):
+                selected = git_parser.select_commits(include or list(tips), exclude, max_count, since, until)
+            commit_hashes = list(selected)
+        dag = CommitDag()
+        with stats.phase('output'):
+            git_parser.write_graph(commit_hashes, sys.stdout, output_format=output_format, jobs=jobs, dag=dag, selected=selected,
+                                   min_run=2 if collapse else None, max_depth=max_depth, first_parent=first_parent)
+        if churn:  # статистика изменений по тому же графу, рядом с ним
+            with stats.phase('churn'):
+                report = churn_report(dag, churn_top)
+            stats.write_summary(report, churn)
+        with stats.phase('cache_save'):
+            if git_parser.history_cache is not None:
+                git_parser.history_cache.save(tips)
+            if git_parser.path_index is not None:
+                git_parser.path_index.save()
         print('Вы можете визуализировать граф здесь: ', config.get('settings', 'visualization_path'))
     else:
         print("Путь к репозиторию не найден в конфигурационном файле.")
@@ -173,6 +554,22 @@ def main(config_path):
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     parser.add_argument("config_path", help="Введите путь до конфигурационного файла", type=str)
+    parser.add_argument("revisions", help="Ревизии в стиле git rev-list: A..B, ^A, B (по умолчанию все ссылки)", nargs='*')
+    parser.add_argument("--jobs", help="Число процессов для сравнения деревьев коммитов", type=int, default=1)
+    parser.add_argument("-n", "--max-count", help="Вывести не больше N последних коммитов", type=int)
+    parser.add_argument("--since", help="Только коммиты не старше даты (ISO 8601 или метка времени Unix)")
+    parser.add_argument("--until", help="Только коммиты не новее даты (ISO 8601 или метка времени Unix)")
+    parser.add_argument("--format", help="Формат вывода графа", choices=sorted(EMITTERS), default='mermaid')
+    parser.add_argument("--collapse", help="Сворачивать линейные участки истории в узлы-диапазоны", action='store_true')
+    parser.add_argument("--max-depth", help="Показывать коммиты не дальше N от вершин", type=int)
+    parser.add_argument("--first-parent", help="Следовать только за первыми родителями слияний", action='store_true')
+    parser.add_argument("--path", help="Только коммиты, изменившие файл или каталог (можно повторять)", action='append', default=[])
+    parser.add_argument("--churn", nargs='?', const='-', metavar='FILE',
+                        help="Вывести JSON-отчёт о частоте изменений файлов, каталогов и пар файлов (в stderr или в FILE)")
+    parser.add_argument("--churn-top", help="Число строк в каждом разделе отчёта --churn", type=int, default=20)
+    stats.add_arguments(parser)
     args = parser.parse_args()
     
-    main(args.config_path)
+    with stats.session_from_args(args):
+        main(args.config_path, args.jobs, args.revisions, args.max_count, args.since, args.until,
+             args.format, args.collapse, args.max_depth, args.first_parent, args.path, args.churn, args.churn_top)